@@ -0,0 +1,4 @@
+from src.ai.benchmark import main
+
+if __name__ == '__main__':
+    main()
@@ -1,310 +1,846 @@
+import heapq
 import time
-import tracemalloc
-from src.utils.game_loader import GameLoader
-from src.gameplay.gameplay_logic import check_auto_moves
-from src.config import config_manager
-
-class DFS:
-    def __init__(self, gameplay_screen, max_depth=1000):
+from time import perf_counter
+from collections import deque
+from src.ai.board import Board
+from src.ai.deadlock import find_deadlock
+from src.ai.heuristics import BoardHeuristics
+from src.ai.pruning import MovePruner
+from src.ai.background import SearchProgress
+from src.ai.profiling import MemoryProbe
+from src.ai.transposition import ENTRY_BYTES, TranspositionTable
+
+# Rough cost of a node kept by BFS, UCS and A*: its parent entry (tuple, move, list slots) and, while it waits in
+# the frontier, its entry there (tuple, state key, cost, packed board)
+PARENT_BYTES = 160
+FRONTIER_BYTES = 250
+
+
+class BoardSolver:
+    """
+    Base for the solvers, the search runs on a headless Board copied from the GameplayScreen so no sprite is
+    touched until the solution is played
+    """
+    def __init__(self, gameplay_screen, exact_keys=False, memory_limit=256, progress=None):
+        """
+        :param gameplay_screen: The GameplayScreen to solve
+        :param exact_keys: If True the full position is kept next to each hash to catch Zobrist collisions
+        :param memory_limit: Memory cap in MB of the visited states table, BFS, UCS and A* count their parent and
+        frontier entries against it too and give up once it is reached
+        :param progress: SearchProgress updated once per node, used to follow or cancel a background search
+        """
         self.gameplay_screen = gameplay_screen
-        self.visited_states = set()  # Para evitar ciclos
+        self.board = Board.from_screen(gameplay_screen)
+        # The gameplay loop plays these before asking for the first move
+        self.board.play_auto_moves()
+        self.cards = Board.card_lookup(gameplay_screen)
+        self.progress = progress or SearchProgress()
+        self.stats = self.progress.stats  # SearchStats when instrumented, None otherwise
         self.solution_path = []  # Para armazenar o caminho até o estado de vitória
-        self.new_solution_path = []
-        self.max_depth = max_depth
-
-        # Iniciar medição de tempo e memória
-        tracemalloc.start()
+        # Shared with the progress so a background handle can play moves as soon as they are translated
+        self.new_solution_path = self.progress.moves
+        self.index = 0
+        self.exact_keys = {} if exact_keys else None
+        self.collisions = 0
+        self.execution_time = None
+        self.memory_usage = None  # Peak KB, measured at the progress' profiling level
+        self.memory_limit = memory_limit
+        self.memory_exhausted = False  # Set when a search gave up on memory_limit (see memory_full)
+        self.pruner = None  # Set by the solvers that search in place
+        self.visited_states = None  # Set by the solvers that keep a TranspositionTable
+        self.deadlock = None  # Cards that can never leave their slot, if the board is lost from the start
+
+    def run(self, search):
+        """
+        Times a search and measures its memory at the progress' profiling level (see profiling)
+        :param search: The solver's search method
+        :return: What the search returned, False without searching if the board is already lost (see deadlock)
+        """
+        probe = MemoryProbe(self.progress.profile)
+        probe.start()
         start_time = time.time()
+        try:
+            self.deadlock = find_deadlock(self.board)
+            if self.deadlock is not None:
+                return False
+            return search()
+        finally:
+            # Also when cancelled, so tracing isn't left on for the rest of the game
+            self.execution_time = time.time() - start_time
+            self.memory_usage = probe.stop()
+            self.progress.peak_kb = self.memory_usage
+            self.progress.pruning = self.pruner.stats() if self.pruner is not None else None
+
+    def metrics(self):
+        """
+        Métricas da última execução, the benchmark suite (bench.py) is the place to compare runs
+        :return: Dict with the time, peak memory, table and pruning counters (None for solvers without them) and the
+        solution length
+        """
+        return {
+            "algorithm": type(self).__name__,
+            "execution_time": self.execution_time,
+            "memory_usage_kb": self.memory_usage,
+            "visited_states": self.visited_states.stats() if self.visited_states is not None else None,
+            "pruning": self.pruner.stats() if self.pruner is not None else None,
+            "solution_length": len(self.solution_path),
+        }
 
-        # Executar o algoritmo
-        found = self.dfs()
-        if not found:
-            self.solution_path = []
-
+    def get_move(self):
+        if self.index < len(self.new_solution_path):
+            move = self.new_solution_path[self.index]
 
-        # Parar medição de tempo e memória
-        end_time = time.time()
-        current, peak = tracemalloc.get_traced_memory()
-        tracemalloc.stop()
+            self.index += 1
 
-        # Calcular métricas
-        execution_time = end_time - start_time
-        memory_usage = peak / 1024  # Converter para KB
+            return move
+        else:
+            #print("can't do more moves")
+            return 0,0,0
 
-        # Guardar métricas num ficheiro
-        self.save_metrics("DFS", execution_time, memory_usage)
 
-        self.index = 0
-        print(self.solution_path)
+class DFS(BoardSolver):
+    def __init__(self, gameplay_screen, max_depth=1000, exact_keys=False, memory_limit=256, prune=True,
+                 time_limit=None, progress=None):
+        """
+        :param prune: If True the moves go through a MovePruner
+        :param time_limit: Seconds before giving up, None for no limit
+        """
+        super().__init__(gameplay_screen, exact_keys, memory_limit, progress)
+        if prune:
+            self.pruner = MovePruner()
+        self.visited_states = TranspositionTable(memory_limit)  # Para evitar ciclos
+        self.max_depth = max_depth
+        self.time_limit = time_limit
 
-        translate_solution_to_index(self)
-        if not self.solution_path:
+        # Executar o algoritmo, com medição de tempo e memória
+        found = self.run(self.dfs)
+        if not found:
+            self.solution_path = []
             gameplay_screen.is_lose = True
+        translate_solution_to_index(self)
 
-        print(self.new_solution_path)
-        self.gameplay_screen.load_from_move_stack(0)
+    def dfs(self):
+        """
+        Implementa o algoritmo DFS para encontrar o estado de vitória (see depth_first)
+        """
+        return depth_first(self, self.max_depth, self.time_limit)
 
-    def dfs(self, depth=0):
+class BFS(BoardSolver):
+    def __init__(self, gameplay_screen, time_limit=None, exact_keys=False, memory_limit=256, progress=None):
         """
-        Implementa o algoritmo DFS para encontrar o estado de vitória.
+        :param time_limit: Seconds before giving up, None for no limit
         """
-        if depth > self.max_depth:
-            return False  # Limite de profundidade atingido
+        super().__init__(gameplay_screen, exact_keys, memory_limit, progress)
+        self.visited_states = TranspositionTable(memory_limit)
+        self.time_limit = time_limit
 
-        # Verifica se o estado atual é um estado de vitória
-        if is_win_state(self):
-            return True
+        found = self.run(self.bfs)
+        if not found:
+            self.solution_path = []
+            gameplay_screen.is_lose = True
+        translate_solution_to_index(self)
 
-        # Gera os movimentos possíveis
-        possible_moves = get_possible_moves(self)
+    def bfs(self):
+        """
+        Implementa o algoritmo BFS para encontrar o estado de vitória.
 
-        for move in possible_moves:
-            # Aplica o movimento
-            apply_move(self, move)
+        The queue only holds (node, packed board), the moves are kept once in parents and followed back at the end.
+        """
+        start_time = time.time()
+        parents = [(-1, None)]  # node -> (parent node, move)
+        depths = [0]
+        queue = deque()
+        queue.append((0, self.board.pack()))  # Estado inicial
+        self.visited_states.add(get_state_key(self))
 
-            # Gera a chave do estado atual
-            state_key = get_state_key(self)
+        if is_win_state(self):
+            return True
 
-            # Verifica se o estado já foi visitado
-            if state_key not in self.visited_states:
-                self.visited_states.add(state_key)
-                self.solution_path.append(move)
+        while queue:
+            if self.time_limit is not None and time.time() - start_time > self.time_limit:
+                return False
+            if memory_full(self, len(parents), len(queue)):
+                return False
 
-                # Chama recursivamente o DFS
-                if self.dfs(depth + 1):
-                    return True
+            node, snapshot = queue.popleft()
+            expand_node(self, depths[node], len(queue))
+            load_snapshot(self, snapshot)
 
-                # Remove o movimento do caminho da solução
-                self.solution_path.pop()
+            for move in get_possible_moves(self):
+                record = apply_move(self, move)
+                new_state_key = get_state_key(self)
+
+                # Adiciona o novo estado à fila se ainda não foi visitado
+                if new_state_key not in self.visited_states:
+                    self.visited_states.add(new_state_key, depths[node] + 1)
+                    parents.append((node, move))
+                    depths.append(depths[node] + 1)
+                    if is_win_state(self):
+                        self.solution_path = trace_path(parents, len(parents) - 1)
+                        return True
+                    queue.append((len(parents) - 1, self.board.pack()))
+                else:
+                    count_duplicate(self)
 
-            # Desfaz o movimento
-            undo_move(self, move)
+                # Desfaz o movimento para voltar ao estado anterior
+                undo_move(self, record)
 
         return False
 
-    def save_metrics(self, algorithm_name, execution_time, memory_usage):
-        """
-        Guarda as métricas de execução num ficheiro de texto.
-        """
-        with open("metrics.txt", "a") as file:
-            file.write(f"Algorithm: {algorithm_name}\n")
-            file.write(f"Execution Time: {execution_time:.4f} seconds\n")
-            file.write(f"Memory Usage: {memory_usage:.2f} KB\n")
-            file.write(f"Solution Path: {self.solution_path}\n")
-            file.write("-" * 40 + "\n")
+class UniformCostSearch(BoardSolver):
+    def __init__(self, gameplay_screen, exact_keys=False, memory_limit=256, progress=None):
+        super().__init__(gameplay_screen, exact_keys, memory_limit, progress)
 
-    def get_move(self):
-        if self.index < len(self.new_solution_path):
-            move = self.new_solution_path[self.index]
+        self.visited_states = TranspositionTable(memory_limit)
 
-            self.index += 1
+        found = self.run(self.search)
+        if not found:
+            self.solution_path = []
+            gameplay_screen.is_lose = True
+        translate_solution_to_index(self)
 
-            return move
-        else:
-            #print("can't do more moves")
-            return 0,0,0
+    def move_cost(self, board):
+        score = BoardHeuristics.weighted_combination(board)
+        return 1000 - score  # Don't know if 1000 is too much or too little, I'll tweak it later
 
-class BFS:
-    def bfs(self):
+    def search(self):
         """
-        Implementa o algoritmo BFS para encontrar o estado de vitória.
+        Frontier entries are (cost, depth, node, state key, packed board), the moves are kept once in parents
         """
-        queue = deque()
+        parents = [(-1, None)]  # node -> (parent node, move)
         initial_state_key = get_state_key(self)
-        queue.append((initial_state_key, []))  # Estado inicial e caminho vazio
-        self.visited_states.add(initial_state_key)
+        queue = [(0, 0, 0, initial_state_key, self.board.pack())]
+
+        self.visited_states.store(initial_state_key, 0)
 
         while queue:
-            current_state_key, path_so_far = queue.popleft()
+            if memory_full(self, len(parents), len(queue)):
+                return False
 
-            # Aplica os movimentos do caminho até o estado atual
-            for move in path_so_far:
-                apply_move(self, move)
+            total_cost, depth, node, state_key, snapshot = heapq.heappop(queue)
+            if self.visited_states.get(state_key, total_cost) < total_cost:
+                continue  # Already reached for less
+            expand_node(self, depth, len(queue))
+            load_snapshot(self, snapshot)
 
-            # Verifica se o estado atual é um estado de vitória
             if is_win_state(self):
-                self.solution_path = path_so_far
+                self.solution_path = trace_path(parents, node)
                 return True
 
-            # Gera os movimentos possíveis
-            possible_moves = get_possible_moves(self)
 
-            for move in possible_moves:
-                apply_move(self, move)
+            for move in get_possible_moves(self):
+                record = apply_move(self,move)
                 new_state_key = get_state_key(self)
 
-                # Adiciona o novo estado à fila se ainda não foi visitado
-                if new_state_key not in self.visited_states:
-                    self.visited_states.add(new_state_key)
-                    queue.append((new_state_key, path_so_far + [move]))
+                move_c = evaluate(self, self.move_cost)
+                new_cost = total_cost + move_c
 
-                # Desfaz o movimento para voltar ao estado anterior
-                undo_move(self, move)
+                known_cost = self.visited_states.get(new_state_key)
+                if known_cost is None or new_cost < known_cost:
+                    self.visited_states.store(new_state_key, new_cost, depth + 1)
+                    parents.append((node, move))
+                    heapq.heappush(queue, (new_cost, depth + 1, len(parents) - 1, new_state_key, self.board.pack()))
+                else:
+                    count_duplicate(self)
 
-            # Desfaz os movimentos aplicados para retornar ao estado inicial deste nó
-            for move in reversed(path_so_far):
-                undo_move(self, move)
+                undo_move(self,record)
 
         return False
 
-    def get_move(self):
-        if self.index < len(self.new_solution_path):
-            move = self.new_solution_path[self.index]
-            self.index += 1
-            return move
-        else:
-            return 0, 0, 0
 
-import heapq
-from src.ai.heuristics import Heuristics
+class AStar(BoardSolver):
+    """
+    A* with g = moves made and h = BoardHeuristics.lower_bound, so the first solution popped is the shortest
 
-class UniformCostSearch:
-    def __init__(self, gameplay_screen):
-        self.gameplay_screen = gameplay_screen
+    With weight > 1 it becomes weighted A* (f = g + weight * h), which finds a solution faster but maybe a longer one.
+    Frontier entries hold a packed board and a parent index instead of the whole path.
+    """
+    def __init__(self, gameplay_screen, weight=1.0, heuristic=None, time_limit=None, exact_keys=False,
+                 memory_limit=256, progress=None):
+        """
+        :param weight: Weight of h in f
+        :param heuristic: Function board -> estimated moves left, BoardHeuristics.lower_bound by default
+        :param time_limit: Seconds before giving up, None for no limit
+        """
+        super().__init__(gameplay_screen, exact_keys, memory_limit, progress)
+        self.weight = weight
+        self.heuristic = heuristic or BoardHeuristics.lower_bound
+        self.time_limit = time_limit
+        self.nodes_expanded = 0
 
-        self.visited_states = {}  
-        self.solution_path = []
+        found = self.run(self.search)
+        if not found:
+            self.solution_path = []
+            gameplay_screen.is_lose = True
+        translate_solution_to_index(self)
 
-        self.new_solution_path = []
+    def search(self):
+        start_time = time.time()
+        parents = [(-1, None)]  # node -> (parent node, move)
+        state_key = get_state_key(self)
+        best_g = TranspositionTable(self.memory_limit)
+        best_g.store(state_key, 0)
+        self.visited_states = best_g
+        # (f, -g, node, state key, packed board), deeper nodes first on ties
+        queue = [(self.weight * self.heuristic(self.board), 0, 0, state_key, self.board.pack())]
 
-        found = self.search()
-        self.index = 0
-        print(self.solution_path)
+        while queue:
+            if self.time_limit is not None and time.time() - start_time > self.time_limit:
+                return False
+            if memory_full(self, len(parents), len(queue)):
+                return False
+
+            _, g, node, state_key, snapshot = heapq.heappop(queue)
+            g = -g
+            if best_g.get(state_key, g) < g:
+                continue  # Already reached with fewer moves
+            expand_node(self, g, len(queue))
+            load_snapshot(self, snapshot)
+
+            if is_win_state(self):
+                self.solution_path = trace_path(parents, node)
+                return True
+
+            self.nodes_expanded += 1
+            for move in get_possible_moves(self):
+                record = apply_move(self, move)
+                new_state_key = get_state_key(self)
+                if g + 1 < best_g.get(new_state_key, g + 2):
+                    best_g.store(new_state_key, g + 1, g + 1)
+                    parents.append((node, move))
+                    f = g + 1 + self.weight * evaluate(self, self.heuristic)
+                    heapq.heappush(queue, (f, -g - 1, len(parents) - 1, new_state_key, self.board.pack()))
+                else:
+                    count_duplicate(self)
+                undo_move(self, record)
 
+        return False
+
+
+class IDAStar(BoardSolver):
+    """
+    Iterative deepening A*: depth first searches bounded by f = g + h, raising the bound to the smallest f that went
+    over it. Memory is only the current path, at the cost of searching the top of the tree again each iteration.
+    """
+    def __init__(self, gameplay_screen, heuristic=None, time_limit=None, max_depth=1000, exact_keys=False,
+                 prune=True, progress=None):
+        """
+        :param heuristic: Admissible function board -> moves left, BoardHeuristics.lower_bound by default
+        :param time_limit: Seconds before giving up, None for no limit
+        :param max_depth: Highest f bound tried
+        :param prune: If True the moves go through a MovePruner
+        """
+        super().__init__(gameplay_screen, exact_keys, progress=progress)
+        if prune:
+            self.pruner = MovePruner()
+        self.heuristic = heuristic or BoardHeuristics.lower_bound
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.nodes_expanded = 0
+
+        found = self.run(self.search)
+        if not found:
+            self.solution_path = []
+            gameplay_screen.is_lose = True
         translate_solution_to_index(self)
-        print(self.new_solution_path)
 
-        print(found)
-        self.gameplay_screen.load_from_move_stack(0)
+    def search(self):
+        self.start_time = time.time()
+        threshold = self.heuristic(self.board)
+        while threshold <= self.max_depth:
+            result = self.bounded_search(threshold)
+            if result is True:
+                return True
+            if result is None:
+                return False  # Out of time or nothing left over the bound
+            threshold = result
+        return False
 
-    
-    def get_move(self):
-        if self.index < len(self.new_solution_path):
-            move = self.new_solution_path[self.index]
+    def bounded_search(self, threshold):
+        """
+        Depth first search with an explicit stack, pruning nodes with f over the threshold
+        :return: True if solved, otherwise the next threshold (None if there is none or time ran out)
+        """
+        if is_win_state(self):
+            return True
 
-            self.index += 1
+        next_threshold = None
+        path_keys = {get_state_key(self)}  # Cycle check on the current path only
+        stack = [(iter(get_possible_moves(self)), None, None)]
+        while stack:
+            move = next(stack[-1][0], None)
+
+            if move is None:
+                _, record, state_key = stack.pop()
+                if record is not None:
+                    path_keys.discard(state_key)
+                    undo_move(self, record)
+                    self.solution_path.pop()
+                continue
+
+            self.nodes_expanded += 1
+            expand_node(self, len(stack), len(stack))
+            if self.time_limit is not None and self.nodes_expanded % 1024 == 0:
+                if time.time() - self.start_time > self.time_limit:
+                    return None
+
+            record = apply_move(self, move)
+            state_key = get_state_key(self)
+            if state_key in path_keys:
+                count_duplicate(self)
+                undo_move(self, record)
+                continue
+
+            f = len(stack) + evaluate(self, self.heuristic)
+            if f > threshold:
+                if next_threshold is None or f < next_threshold:
+                    next_threshold = f
+                undo_move(self, record)
+                continue
+
+            self.solution_path.append(move)
+            if is_win_state(self):
+                return True
+            path_keys.add(state_key)
+            stack.append((iter(get_possible_moves(self, move, record)), record, state_key))
 
-            return move
-        else:
-            #print("can't do more moves")
-            return 0,0,0
+        return next_threshold
 
 
+class AnytimeSearch(BoardSolver):
+    """
+    Anytime search: rounds of weighted A* under a move budget. Each round keeps the line to the best board it
+    reached, ranked by cards on the foundations and then by fewer moves, and publishes it for get_move to play
+    while the next round searches on from where that line ends.
 
-    def move_cost(self, gameplay_screen):
-        score = Heuristics.weighted_combination(gameplay_screen)
-        return 1000 - score  # Don't know if 1000 is too much or too little, I'll tweak it later
+    It gives up (is_lose) when a whole round finds no board with more cards on the foundations, or when time_limit
+    runs out, after the lines found so far have been played.
+    """
+    def __init__(self, gameplay_screen, move_budget=2.0, node_budget=None, time_limit=None, weight=2.0,
+                 heuristic=None, exact_keys=False, memory_limit=256, progress=None):
+        """
+        :param move_budget: Seconds each round may search
+        :param node_budget: Nodes each round may expand, None for no limit
+        :param time_limit: Seconds before giving up on the whole game, None for no limit
+        :param weight: Weight of h in f
+        :param heuristic: Function board -> estimated moves left, BoardHeuristics.cards_left by default
+        """
+        super().__init__(gameplay_screen, exact_keys, memory_limit, progress)
+        self.move_budget = move_budget
+        self.node_budget = node_budget
+        self.time_limit = time_limit
+        self.weight = weight
+        self.heuristic = heuristic or BoardHeuristics.cards_left
+        self.visited_states = TranspositionTable(memory_limit)  # Cleared at each round
+        self.rounds = 0
+        self.nodes_expanded = 0
+
+        found = self.run(self.search)
+        if not found:
+            gameplay_screen.is_lose = True
 
     def search(self):
-        queue = []
-        initial_state_key = get_state_key(self)
-        heapq.heappush(queue, (0,0, [], initial_state_key))
+        start_time = time.time()
+        while not is_win_state(self):
+            if self.time_limit is not None and time.time() - start_time > self.time_limit:
+                return False
+            line = self.search_round()
+            if not line:
+                return False  # Nothing better than the current board within the budget
+
+            start = len(self.solution_path)
+            for move in line:
+                apply_move(self, move)
+            self.solution_path.extend(line)
+            translate_solution_to_index(self, start)
+            self.rounds += 1
+        return True
 
-        self.visited_states[initial_state_key] = 0
+    def search_round(self):
+        """
+        One weighted A* from the current board, stopped by the budgets or a win
+        :return: Moves to the winning board if found, else to the best board reached. Empty if no board beats the
+        current one
+        """
+        round_start = time.time()
+        root = self.board
+        parents = [(-1, None)]  # node -> (parent node, move)
+        state_key = get_state_key(self)
+        best_g = self.visited_states
+        best_g.clear()
+        best_g.store(state_key, 0)
+        best_node, best_score = 0, (root.foundation_count(), 0)
+        queue = [(self.weight * self.heuristic(root), 0, 0, state_key, root.pack())]
+        nodes = 0
 
         while queue:
-            total_cost, _, path_so_far, state_key = heapq.heappop(queue)
+            if self.node_budget is not None and nodes >= self.node_budget:
+                break
+            if nodes % 256 == 0 and time.time() - round_start > self.move_budget:
+                break
+
+            _, g, node, state_key, snapshot = heapq.heappop(queue)
+            g = -g
+            if best_g.get(state_key, g) < g:
+                continue
+            expand_node(self, len(self.solution_path) + g, len(queue))
+            load_snapshot(self, snapshot)
+            nodes += 1
+
+            score = (self.board.foundation_count(), -g)
+            if score > best_score:
+                best_node, best_score = node, score
+            if is_win_state(self):
+                break
 
+            for move in get_possible_moves(self):
+                record = apply_move(self, move)
+                new_state_key = get_state_key(self)
+                if g + 1 < best_g.get(new_state_key, g + 2):
+                    best_g.store(new_state_key, g + 1, g + 1)
+                    parents.append((node, move))
+                    f = g + 1 + self.weight * evaluate(self, self.heuristic)
+                    heapq.heappush(queue, (f, -g - 1, len(parents) - 1, new_state_key, self.board.pack()))
+                else:
+                    count_duplicate(self)
+                undo_move(self, record)
 
-            for move in path_so_far:
-                apply_move(self,move)
+        self.board = root
+        self.nodes_expanded += nodes
+        return trace_path(parents, best_node)
 
-            if is_win_state(self):
-                self.solution_path = path_so_far
-                for move in reversed(path_so_far):
-                    undo_move(self,move)
+
+class BeamSearch(BoardSolver):
+    """
+    Beam search: a breadth first search that only keeps the beam_width best children of each layer, ranked by the
+    heuristic. At most beam_width nodes per layer are expanded, so solve times stay short and predictable where the
+    exhaustive searches are too slow (Hard mode), at the cost of missing solutions the beam cut off.
+
+    When the beam dies out before winning it is tried again twice as wide, up to max_width, and then a DFS with
+    what is left of the time limit.
+    """
+    def __init__(self, gameplay_screen, beam_width=64, max_width=1024, heuristic=None, batch_heuristic=None,
+                 time_limit=None, max_depth=1000, fallback=True, exact_keys=False, memory_limit=256, progress=None):
+        """
+        :param beam_width: Children kept per layer on the first try
+        :param max_width: Widest beam tried before the fallback
+        :param heuristic: Function board -> score, lower is better. BoardHeuristics.beam_score by default
+        :param batch_heuristic: Function list of packed boards -> list of scores, lower is better. If given it is
+        used instead of heuristic, once per layer (see vectorized.move_costs)
+        :param time_limit: Seconds before giving up, None for no limit
+        :param max_depth: Layers before a beam is given up
+        :param fallback: If True a DFS runs after the widest beam fails
+        """
+        super().__init__(gameplay_screen, exact_keys, memory_limit, progress)
+        self.beam_width = beam_width
+        self.max_width = max_width
+        self.heuristic = heuristic or BoardHeuristics.beam_score
+        self.batch_heuristic = batch_heuristic
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.fallback = fallback
+        self.widths = []  # Beam widths tried, 0 stands for the DFS fallback
+        self.visited_states = TranspositionTable(memory_limit)  # Cleared for each beam and the fallback
+        self.nodes_expanded = 0
+
+        found = self.run(self.search)
+        if not found:
+            self.solution_path = []
+            gameplay_screen.is_lose = True
+        translate_solution_to_index(self)
+
+    def search(self):
+        self.start_time = time.time()
+        if is_win_state(self):
+            return True
+
+        root = self.board
+        width = self.beam_width
+        while width <= self.max_width:
+            self.widths.append(width)
+            path = self.beam(width)
+            self.board = root
+            if path is not None:
+                self.solution_path = path
                 return True
+            if self.out_of_time():
+                return False
+            width *= 2
+
+        if not self.fallback:
+            return False
+        self.widths.append(0)
+        # depth_first only needs the attributes set here, its time limit is what the beams left
+        self.pruner = MovePruner()
+        self.visited_states.clear()
+        time_left = None if self.time_limit is None else self.time_limit - (time.time() - self.start_time)
+        return depth_first(self, self.max_depth, time_left)
+
+    def out_of_time(self):
+        return self.time_limit is not None and time.time() - self.start_time > self.time_limit
+
+    def beam(self, width):
+        """
+        One beam search from the board
+        :param width: Children kept per layer
+        :return: Moves to the winning board, None if the beam died out or time ran out
+        """
+        parents = [(-1, None)]  # node -> (parent node, move)
+        visited = self.visited_states
+        visited.clear()
+        visited.add(get_state_key(self))
+        layer = [(0, self.board.pack())]  # (node, packed board)
+
+        for depth in range(self.max_depth):
+            if not layer or self.out_of_time():
+                return None
+
+            children = {}  # state key -> (score, order, parent node, move, packed board)
+            for node, snapshot in layer:
+                expand_node(self, depth, len(children))
+                load_snapshot(self, snapshot)
+                self.nodes_expanded += 1
+
+                for move in get_possible_moves(self):
+                    record = apply_move(self, move)
+                    state_key = get_state_key(self)
+                    if state_key in visited or state_key in children:
+                        count_duplicate(self)
+                    elif is_win_state(self):
+                        parents.append((node, move))
+                        return trace_path(parents, len(parents) - 1)
+                    else:
+                        score = None if self.batch_heuristic else evaluate(self, self.heuristic)
+                        children[state_key] = (score, len(children), node, move, self.board.pack())
+                    undo_move(self, record)
+
+            if self.batch_heuristic:
+                self.score_layer(children)
+            layer = []
+            for state_key, (_, _, node, move, snapshot) in heapq.nsmallest(width, children.items(),
+                                                                          key=lambda item: item[1][:2]):
+                visited.add(state_key, depth + 1)
+                parents.append((node, move))
+                layer.append((len(parents) - 1, snapshot))
+
+        return None
+
+    def score_layer(self, children):
+        """
+        Scores the children of a layer with one call to batch_heuristic, timed when instrumented
+        """
+        start = perf_counter() if self.stats is not None else None
+        scores = self.batch_heuristic([child[4] for child in children.values()])
+        for (state_key, (_, order, node, move, snapshot)), score in zip(list(children.items()), scores):
+            children[state_key] = (score, order, node, move, snapshot)
+        if start is not None:
+            self.stats.timed("heuristic", start)
 
 
-            for move in get_possible_moves(self):
-                apply_move(self,move)
-                new_state_key = get_state_key(self)
+def depth_first(self, max_depth, time_limit=None):
+    """
+    Iterative DFS from the solver's board, shared by DFS and the fallback of BeamSearch. Each frame of the stack
+    keeps the iterator over the moves left to try and the undo record of the move that led to it, so there is no
+    recursion limit and depth can go past 1000. Uses the solver's visited_states, pruner and solution_path.
+    :param max_depth: Deepest move tried
+    :param time_limit: Seconds before giving up, None for no limit
+    :return: True with the moves in solution_path, False if there is no solution within max_depth or time ran out
+    """
+    if is_win_state(self):
+        return True
+
+    # The table may evict states, so cycles are also checked against the current path
+    path_keys = {get_state_key(self)}
+    stack = [(iter(get_possible_moves(self)), None, None)]
+    start_time = time.time()
+    nodes = 0
+    while stack:
+        move = next(stack[-1][0], None)
+
+        if move is None:
+            # Sem mais movimentos, volta ao estado anterior
+            _, record, state_key = stack.pop()
+            if record is not None:
+                path_keys.discard(state_key)
+                undo_move(self, record)
+                self.solution_path.pop()
+            continue
+
+        # Aplica o movimento
+        expand_node(self, len(stack), len(stack))
+        nodes += 1
+        if time_limit is not None and nodes % 1024 == 0:
+            if time.time() - start_time > time_limit:
+                return False
+        record = apply_move(self, move)
+
+        # Verifica se o estado já foi visitado
+        state_key = get_state_key(self)
+        if state_key in path_keys or state_key in self.visited_states:
+            count_duplicate(self)
+            undo_move(self, record)
+            continue
+        self.visited_states.add(state_key, len(stack))
+
+        if len(stack) > max_depth:
+            undo_move(self, record)  # Limite de profundidade atingido
+            continue
+
+        self.solution_path.append(move)
+        if is_win_state(self):
+            return True
 
-                move_c = self.move_cost(self.gameplay_screen)
-                new_cost = total_cost + move_c
+        path_keys.add(state_key)
+        stack.append((iter(get_possible_moves(self, move, record)), record, state_key))
 
-                if new_state_key not in self.visited_states or new_cost < self.visited_states[new_state_key]:
-                    self.visited_states[new_state_key] = new_cost
-                    heapq.heappush(queue, (new_cost, len(path_so_far) + 1, path_so_far + [move], new_state_key))
+    return False
 
-                undo_move(self,move)
 
+def trace_path(parents, node):
+    """
+    Follows parent pointers back to the root
+    :param parents: List node -> (parent node, move), the root is node 0
+    :param node: The last node
+    :return: List of moves from the root
+    """
+    path = []
+    while node > 0:
+        node, move = parents[node]
+        path.append(move)
+    path.reverse()
+    return path
+
+
+def memory_full(self, nodes, frontier_size):
+    """
+    Memory check of the searches that keep every node they reach, estimated from the entry counts. Without it the
+    parents and the frontier grow past memory_limit, and faster once the table evicts states that then get queued
+    again
+    :param nodes: Parent entries kept
+    :param frontier_size: Entries in the queue or heap
+    :return: True, with memory_exhausted set, once the visited states, parents and frontier pass memory_limit
+    """
+    used = len(self.visited_states) * ENTRY_BYTES + nodes * PARENT_BYTES + frontier_size * FRONTIER_BYTES
+    if used <= self.memory_limit * 1024 * 1024:
         return False
+    self.memory_exhausted = True
+    return True
+
+
+def expand_node(self, depth, frontier_size):
+    """
+    Reports a node to the progress (and the stats when instrumented)
+    :param depth: Depth of the node
+    :param frontier_size: Length of the solver's queue or stack
+    """
+    self.progress.update(depth)
+    if self.stats is not None:
+        self.stats.node(depth, frontier_size)
+
+
+def count_duplicate(self):
+    if self.stats is not None:
+        self.stats.duplicates += 1
+
+
+def evaluate(self, heuristic):
+    """
+    Calls a heuristic on the solver's board, timed when instrumented
+    """
+    if self.stats is None:
+        return heuristic(self.board)
+    start = perf_counter()
+    value = heuristic(self.board)
+    self.stats.timed("heuristic", start)
+    return value
+
 
 def apply_move(self, move):
-    source_slot, card, target_slot = move
-    target_slot.drop_card(card, source_slot)
-    auto_moves = check_auto_moves(self.gameplay_screen.slots, self.gameplay_screen.foundations)
-    if auto_moves:
-        for i, v in auto_moves:
-            for foundation in self.gameplay_screen.foundations:
-                foundation.drop_card(i, v, to_animate=False)
+    """
+    Plays a move (and the auto moves after it) on the solver's board
+    :return: Undo record for undo_move
+    """
+    if self.stats is None:
+        return self.board.apply(move)
+    start = perf_counter()
+    record = self.board.apply(move)
+    self.stats.timed("apply_move", start)
+    return record
 
 
-def undo_move(self, move):
-    source_slot, card, target_slot = move
-    source_slot.undo_drop_card(card, target_slot)
+def undo_move(self, record):
+    if self.stats is None:
+        self.board.undo(record)
+        return
+    start = perf_counter()
+    self.board.undo(record)
+    self.stats.timed("undo_move", start)
+
+
+def load_snapshot(self, snapshot):
+    """
+    Replaces the solver's board with one rebuilt from Board.pack()
+    """
+    start = perf_counter() if self.stats is not None else None
+    self.board = Board.unpack(snapshot, self.board.mv_rules, self.board.sk_size)
+    if start is not None:
+        self.stats.timed("load_snapshot", start)
 
 
 def get_state_key(self):
-    state_key = []
-    for slot in self.gameplay_screen.slots:
-        state_key.append(tuple(card.rank for card in slot.cards))
-    for foundation in self.gameplay_screen.foundations:
-        state_key.append(tuple(card.rank for card in foundation.cards))
-    return tuple(state_key)
-
-def get_possible_moves(self):
-    moves = []
-    if config_manager.gameStackSize == 1:
-        for source_slot in self.gameplay_screen.slots:
-            card = source_slot.top_card()
-            if card:
-                for target_slot in self.gameplay_screen.slots:
-                    if target_slot != source_slot and target_slot.can_accept_card(card):
-                        moves.append((source_slot, card, target_slot))
-                for foundation in self.gameplay_screen.foundations:
-                    if foundation.can_accept_card(card):
-                        moves.append((source_slot, card, foundation))
+    """
+    The board's Zobrist hash, kept up to date by apply_move and undo_move. It ignores slot and foundation order,
+    so permutations of a position are the same state
+
+    With exact_keys, a hash already seen for a different position is counted as a collision and the exact
+    position is added to the key so both states stay apart.
+    """
+    state_key = self.board.hash
+    if self.exact_keys is None:
+        if self.stats is not None:
+            self.stats.calls["get_state_key"] += 1  # Only a read, not worth timing
+        return state_key
+    start = perf_counter() if self.stats is not None else None
+    key = self.board.canonical_key()
+    known = self.exact_keys.setdefault(state_key, key)
+    if known != key:
+        self.collisions += 1
+        state_key = state_key, key
+    if start is not None:
+        self.stats.timed("get_state_key", start)
+    return state_key
+
+def get_possible_moves(self, last_move=None, last_record=None):
+    """
+    Legal moves of the solver's board, pruned if the solver has a MovePruner
+    :param last_move: Move that led to the board, the pruner uses it to cut reversals and swapped move orders
+    :param last_record: Its undo record
+    """
+    start = perf_counter() if self.stats is not None else None
+    if self.pruner is None:
+        moves = self.board.legal_moves()
     else:
-        for source_slot in self.gameplay_screen.slots:
-            for card in source_slot.cards:
-                if card:
-                    for target_slot in self.gameplay_screen.slots:
-                        if target_slot != source_slot and target_slot.can_accept_card(card):
-                            moves.append((source_slot, card, target_slot))
-                    for foundation in self.gameplay_screen.foundations:
-                        if foundation.can_accept_card(card):
-                            moves.append((source_slot, card, foundation))
+        moves = self.pruner.moves(self.board, last_move, last_record)
+    if start is not None:
+        self.stats.timed("get_possible_moves", start)
+        self.stats.branching[len(moves)] += 1
     return moves
 
 def is_win_state(self):
     """
     Verifica se o estado atual é um estado de vitória.
     """
-    total_cards_in_foundations = sum(len(foundation.cards) for foundation in self.gameplay_screen.foundations)
-    return total_cards_in_foundations == 52
+    return self.board.is_win()
 
 
 
 
-def translate_solution_to_index(self):
-    slots = self.gameplay_screen.slots
-    foundations = self.gameplay_screen.foundations
-    for i, card, k in self.solution_path:
-        if i in slots:
-            ni = slots.index(i)
-        elif i in foundations:
-            ni = 13 + foundations.index(i)
-        else:
-            raise ValueError(f'Value {i} not found in slots or foundations.')
-
-        if k in foundations:
-            nk = len(slots) + foundations.index(k)
-        elif k in slots:
-            nk = slots.index(k)
-        else:
-            raise ValueError(f'Value {k} not found in foundations or slots.')
-
-        new_move = (ni, card, nk)
-        self.new_solution_path.append(new_move)
+def translate_solution_to_index(self, start=0):
+    """
+    Converts the board moves of solution_path into the (slot index, Card, slot index) moves played by ai_update
+    :param start: First move to convert, the ones before it were already converted
+    """
+    for i, code, k in self.solution_path[start:]:
+        if code not in self.cards:
+            raise ValueError(f'Card {code} not found in slots or foundations.')
+        self.new_solution_path.append((i, self.cards[code], k))
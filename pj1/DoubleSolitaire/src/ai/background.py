@@ -0,0 +1,147 @@
+"""
+Runs a solver in a background thread so the game keeps rendering while it searches
+
+The solvers do their whole search in the constructor, so BackgroundSolver builds one in a daemon thread from a
+snapshot of the GameplayScreen (the live slots keep changing while the thread reads them). The search reports to a
+SearchProgress that the UI can read at any time and that raises SearchCancelled inside the search once cancelled.
+"""
+import copy
+import threading
+import time
+
+
+class SearchCancelled(Exception):
+    """
+    Raised inside a search once its SearchProgress has been cancelled
+    """
+
+
+class SearchProgress:
+    """
+    Counters updated by a running search
+
+    Atributes:
+        nodes: Nodes expanded so far
+        depth: Depth of the last node expanded
+        moves: Moves ready to play, in the index form of translate_solution_to_index
+        stats: Optional SearchStats the solver fills in (see instrumentation)
+        profile: Memory profiling level of the search (see profiling)
+        peak_kb: Peak memory measured at that level, None until the search ends or with "off"
+        pruning: MovePruner.stats() of the search once it ends, None if it didn't prune
+        start_time: When the progress was created
+        cancelled: Set by cancel(), the search stops at its next update
+    """
+    def __init__(self, stats=None, profile="off"):
+        self.nodes = 0
+        self.depth = 0
+        self.moves = []
+        self.stats = stats
+        self.profile = profile
+        self.peak_kb = None
+        self.pruning = None
+        self.start_time = time.time()
+        self.cancelled = False
+
+    def update(self, depth):
+        """
+        Called by the solvers once per node
+        :param depth: Depth of the node
+        """
+        self.nodes += 1
+        self.depth = depth
+        if self.cancelled:
+            raise SearchCancelled()
+
+    def check(self):
+        """
+        Raises SearchCancelled if the search was cancelled, for loops that don't expand nodes themselves
+        """
+        if self.cancelled:
+            raise SearchCancelled()
+
+    def cancel(self):
+        self.cancelled = True
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start_time
+
+
+class ScreenSnapshot:
+    """
+    Copy of the parts of a GameplayScreen the solvers read (slots, foundations) and write (is_lose)
+    """
+    def __init__(self, gameplay_screen):
+        self.slots = [self._copy_slot(slot) for slot in gameplay_screen.slots]
+        self.foundations = [self._copy_slot(foundation) for foundation in gameplay_screen.foundations]
+        self.is_lose = False
+
+    @staticmethod
+    def _copy_slot(slot):
+        slot_copy = copy.copy(slot)
+        slot_copy.cards = list(slot.cards)
+        return slot_copy
+
+
+class BackgroundSolver:
+    """
+    Handle of a solver running in a daemon thread, polled by ai_update
+
+    It has the solvers' get_move(), which plays the moves the solver has translated so far (all of them at the
+    end of the search, or line by line for AnytimeSearch) and gives (0,0,0) while there are none.
+    """
+    def __init__(self, solver_class, gameplay_screen, on_solved=None, profile="off", **kwargs):
+        """
+        :param solver_class: A BoardSolver subclass
+        :param gameplay_screen: The GameplayScreen to solve
+        :param on_solved: Called from the thread with the solver when it finds a solution
+        :param profile: Memory profiling level of the search (see profiling)
+        :param kwargs: Passed to the solver
+        """
+        self.gameplay_screen = gameplay_screen
+        self.on_solved = on_solved
+        self.progress = SearchProgress(profile=profile)
+        self.solver = None
+        self.snapshot = ScreenSnapshot(gameplay_screen)
+        self.done = False
+        self.reported = False
+        self.index = 0
+        self.thread = threading.Thread(target=self._run, args=(solver_class, kwargs), daemon=True)
+        self.thread.start()
+
+    def _run(self, solver_class, kwargs):
+        try:
+            self.solver = solver_class(self.snapshot, progress=self.progress, **kwargs)
+            if self.on_solved is not None and self.solver.solution_path and not self.snapshot.is_lose:
+                self.on_solved(self.solver)
+        except SearchCancelled:
+            pass
+        finally:
+            self.done = True
+
+    def poll(self):
+        """
+        Checks on the search, passing a failed search on to the GameplayScreen once its moves have been played
+        :return: True if the search is over
+        """
+        if not self.done:
+            return False
+        if not self.reported and self.index >= len(self.progress.moves):
+            self.reported = True
+            if self.snapshot.is_lose and not self.progress.cancelled:
+                self.gameplay_screen.is_lose = True
+        return True
+
+    def cancel(self):
+        """
+        Stops the search, the thread ends at the search's next node
+        """
+        self.progress.cancel()
+
+    def get_move(self):
+        moves = self.progress.moves
+        if self.index < len(moves):
+            move = moves[self.index]
+            self.index += 1
+            return move
+        return 0,0,0
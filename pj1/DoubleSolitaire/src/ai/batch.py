@@ -0,0 +1,158 @@
+"""
+Headless batch solver: deals seeded games, solves them across a process pool and writes one result per deal
+
+    python solve.py --seeds 0-99 --solver wastar --rules hard --time-limit 10 --output results.csv
+
+Each deal runs in a fresh worker process, so peak_kb (the process' peak RSS) is the deal's own. memory_kb is the
+search's peak at the --profile level (see profiling).
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+from src.ai.algorithms import DFS, BFS, UniformCostSearch, AStar, IDAStar, AnytimeSearch, BeamSearch
+from src.ai.board import Board
+from src.ai.heuristics import BoardHeuristics
+from src.ai.headless import run_solver, peak_memory_kb
+from src.ai.mcts import MCTS
+from src.ai.pattern_database import pattern_estimate
+from src.ai.profiling import PROFILE_LEVELS
+from src.ai import vectorized
+
+# name -> (solver class, parameters), the AI modes of the menu
+SOLVERS = {
+    "bfs": (BFS, {}),
+    "dfs": (DFS, {}),
+    "ucs": (UniformCostSearch, {}),
+    "astar": (AStar, {}),
+    "idastar": (IDAStar, {}),
+    "astar-pdb": (AStar, {"heuristic": pattern_estimate}),
+    "idastar-pdb": (IDAStar, {"heuristic": pattern_estimate}),
+    "wastar": (AStar, {"weight": 2.0, "heuristic": BoardHeuristics.cards_left}),
+    "anytime": (AnytimeSearch, {}),
+    "beam": (BeamSearch, {}),
+    "beam-weighted": (BeamSearch, {"batch_heuristic": vectorized.move_costs}),
+    "mcts": (MCTS, {"move_budget": 0.25}),
+}
+
+# Solvers whose heuristic solve.py --heuristic may replace, those that don't rely on it never overestimating
+HEURISTIC_SOLVERS = ("wastar", "beam")
+
+# Difficulty -> (mv_rules, sk_size), as set by the DifficultySelector
+RULES = {
+    "easy": (0, 0),
+    "medium": (1, 0),
+    "hard": (1, 1),
+}
+
+FIELDS = ["seed", "solver", "mv_rules", "sk_size", "solved", "timed_out", "moves", "nodes", "time", "memory_kb",
+          "peak_kb", "branching_before", "branching_after"]
+
+
+def parse_seeds(text):
+    """
+    Reads a list of seeds like "0-99" or "1,5,7-9" (ranges include both ends)
+    :return: List of ints
+    """
+    seeds = []
+    for part in text.split(","):
+        if "-" in part[1:]:
+            first, last = part.split("-", 1)
+            seeds.extend(range(int(first), int(last) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def solve_deal(task):
+    """
+    Worker side: deals and solves one seed
+    :param task: (seed, solver name, mv_rules, sk_size, time limit, instrument, profile, heuristic or None)
+    :return: Result dict with the FIELDS (and "stats" when instrumented)
+    """
+    seed, solver_name, mv_rules, sk_size, time_limit, instrument, profile, heuristic = task
+    solver_class, kwargs = SOLVERS[solver_name]
+    if heuristic is not None and solver_class is BeamSearch and vectorized.AVAILABLE:
+        kwargs = dict(kwargs, batch_heuristic=heuristic.batch)  # Same scores, a layer at a time
+    elif heuristic is not None:
+        kwargs = dict(kwargs, heuristic=heuristic)
+    result, _ = run_solver(solver_class, Board.deal(seed, mv_rules, sk_size), time_limit, instrument, profile,
+                           **kwargs)
+    result.update(seed=seed, solver=solver_name, mv_rules=mv_rules, sk_size=sk_size, peak_kb=peak_memory_kb())
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Solve seeded Double Solitaire deals without opening the game.")
+    parser.add_argument("--seeds", default="0-9", help='Seeds to deal, e.g. "0-99" or "1,5,7-9"')
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="dfs")
+    parser.add_argument("--rules", choices=sorted(RULES), default="easy", help="Difficulty whose stack rules to use")
+    parser.add_argument("--mv-rules", type=int, choices=(0, 1), help="Overrides the stack movement rule")
+    parser.add_argument("--sk-size", type=int, help="Overrides the stack size (0 for any)")
+    parser.add_argument("--time-limit", type=float, help="Seconds per deal before giving up")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes in the pool")
+    parser.add_argument("--output", help="File to write, .csv or .jsonl (JSON lines on stdout by default)")
+    parser.add_argument("--instrument", action="store_true", help="Adds the per-phase search counters (stats)")
+    parser.add_argument("--profile", choices=PROFILE_LEVELS, default="rss", help="How memory_kb is measured")
+    parser.add_argument("--heuristic", help="Model written by learn.py, used as h by wastar and beam")
+    return parser.parse_args(argv)
+
+
+def write_results(results, output, instrument=False):
+    """
+    Writes results as they come, CSV if output ends in .csv, otherwise JSON lines
+    :param results: Iterable of result dicts
+    :param output: File path, None for stdout
+    :param instrument: If True the stats are written too (as a JSON column in CSV)
+    :return: List of the results written
+    """
+    fields = FIELDS + ["stats"] if instrument else FIELDS
+    written = []
+    file = open(output, "w", newline="") if output else sys.stdout
+    try:
+        as_csv = output is not None and output.endswith(".csv")
+        if as_csv:
+            writer = csv.DictWriter(file, fieldnames=fields)
+            writer.writeheader()
+        for result in results:
+            row = {field: result[field] for field in fields}
+            if as_csv:
+                if instrument:
+                    row["stats"] = json.dumps(row["stats"])
+                writer.writerow(row)
+            else:
+                file.write(json.dumps(row) + "\n")
+            file.flush()
+            written.append(result)
+    finally:
+        if output:
+            file.close()
+    return written
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mv_rules, sk_size = RULES[args.rules]
+    if args.mv_rules is not None:
+        mv_rules = args.mv_rules
+    if args.sk_size is not None:
+        sk_size = args.sk_size
+
+    heuristic = None
+    if args.heuristic:
+        if args.solver not in HEURISTIC_SOLVERS:
+            sys.exit(f"--heuristic doesn't work with {args.solver}, only with {' and '.join(HEURISTIC_SOLVERS)}")
+        from src.ai.learned import LearnedHeuristic  # Here since learned imports this module
+        heuristic = LearnedHeuristic.load(args.heuristic)
+
+    tasks = [(seed, args.solver, mv_rules, sk_size, args.time_limit, args.instrument, args.profile, heuristic)
+             for seed in parse_seeds(args.seeds)]
+    with multiprocessing.Pool(max(args.workers or 1, 1), maxtasksperchild=1) as pool:
+        results = write_results(pool.imap(solve_deal, tasks), args.output, args.instrument)
+
+    solved = sum(result["solved"] for result in results)
+    total_time = sum(result["time"] for result in results)
+    print(f"{args.solver}: solved {solved}/{len(results)} deals in {total_time:.1f}s of search", file=sys.stderr)
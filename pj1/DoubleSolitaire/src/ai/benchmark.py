@@ -0,0 +1,187 @@
+"""
+Reproducible solver benchmark
+
+Runs solvers over a fixed corpus (seeded deals for each difficulty plus the saves in test_saves/) with warm-up and
+repeated runs, reports medians and percentiles, and compares them with a stored baseline:
+
+    python bench.py --solvers dfs,wastar --save-baseline bench_baseline.json
+    python bench.py --solvers dfs,wastar --baseline bench_baseline.json --threshold 10
+
+Times and nodes/sec come from the repeated runs, peak memory from one extra run under tracemalloc (tracing slows
+the search down too much to time it). The exit code is 1 when any metric regressed by more than the threshold.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import sys
+
+from src.ai.batch import SOLVERS, RULES
+from src.ai.board import Board
+from src.ai.headless import run_solver
+
+# Deals every run uses, keep them fixed so results stay comparable with the baseline
+CORPUS_SEEDS = {
+    "easy": range(0, 10),
+    "medium": range(0, 10),
+    "hard": range(0, 10),
+}
+SAVES = os.path.join(os.path.dirname(__file__), "..", "..", "test_saves")
+
+# Metric -> True if higher is better
+METRICS = {
+    "time_p50": False,
+    "time_p90": False,
+    "nodes_per_sec_p50": True,
+    "peak_kb_p50": False,
+    "peak_kb_max": False,
+    "solved": True,
+}
+
+
+def corpus():
+    """
+    :return: List of (case name, Board)
+    """
+    cases = []
+    for rules, seeds in CORPUS_SEEDS.items():
+        mv_rules, sk_size = RULES[rules]
+        for seed in seeds:
+            cases.append((f"{rules}-{seed}", Board.deal(seed, mv_rules, sk_size)))
+    for path in sorted(glob.glob(os.path.join(SAVES, "*", "*.save"))):
+        with open(path) as file:
+            board = Board.from_json(json.load(file))
+        cases.append((os.path.relpath(path, SAVES).replace(os.sep, "/"), board))
+    return cases
+
+
+def percentile(values, p):
+    """
+    Nearest rank percentile
+    :param values: Non empty list of numbers
+    :param p: 0-100
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def bench_case(solver_name, board, repeats, warmup, time_limit):
+    """
+    Runs one solver on one board
+    :return: Dict with the median time, nodes/sec and solved of the repeats and the peak memory of a traced run
+    """
+    solver_class, kwargs = SOLVERS[solver_name]
+    for _ in range(warmup):
+        run_solver(solver_class, board, time_limit, **kwargs)
+
+    runs = [run_solver(solver_class, board, time_limit, **kwargs)[0] for _ in range(repeats)]
+    times = [run["time"] for run in runs]
+    rates = [run["nodes"] / run["time"] for run in runs if run["time"] > 0]
+
+    traced, _ = run_solver(solver_class, board, time_limit, profile="tracemalloc", **kwargs)
+
+    return {
+        "solved": runs[0]["solved"],
+        "moves": runs[0]["moves"],
+        "nodes": runs[0]["nodes"],
+        "time": percentile(times, 50),
+        "nodes_per_sec": percentile(rates, 50) if rates else 0.0,
+        "peak_kb": traced["memory_kb"],
+        "branching_before": runs[0]["branching_before"],
+        "branching_after": runs[0]["branching_after"],
+    }
+
+
+def summarize(cases):
+    """
+    :param cases: Dict case name -> bench_case result
+    :return: Dict with the METRICS over all cases
+    """
+    results = list(cases.values())
+    times = [result["time"] for result in results]
+    rates = [result["nodes_per_sec"] for result in results]
+    peaks = [result["peak_kb"] for result in results]
+    return {
+        "time_p50": percentile(times, 50),
+        "time_p90": percentile(times, 90),
+        "nodes_per_sec_p50": percentile(rates, 50),
+        "peak_kb_p50": percentile(peaks, 50),
+        "peak_kb_max": max(peaks),
+        "solved": sum(result["solved"] for result in results),
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    Finds the metrics that got worse than the baseline by more than threshold percent
+    :return: List of messages, empty if nothing regressed
+    """
+    regressions = []
+    for solver_name, current in report["solvers"].items():
+        if solver_name not in baseline["solvers"]:
+            continue
+        before = baseline["solvers"][solver_name]["summary"]
+        after = current["summary"]
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None or old == 0:
+                continue
+            change = (new - old) / old * 100
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{solver_name} {metric}: {old:.4g} -> {new:.4g} ({change:+.1f}%)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the solvers over a fixed corpus of deals.")
+    parser.add_argument("--solvers", default="dfs,wastar", help="Comma separated, from: " + ", ".join(sorted(SOLVERS)))
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per case before the timed ones")
+    parser.add_argument("--time-limit", type=float, default=5.0, help="Seconds per run before giving up")
+    parser.add_argument("--baseline", help="Baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression allowed, in percent")
+    parser.add_argument("--save-baseline", help="Writes this run's report as the new baseline")
+    parser.add_argument("--output", help="Writes this run's report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cases = corpus()
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeats": args.repeats,
+        "warmup": args.warmup,
+        "time_limit": args.time_limit,
+        "solvers": {},
+    }
+
+    for solver_name in args.solvers.split(","):
+        results = {}
+        for name, board in cases:
+            results[name] = bench_case(solver_name, board, args.repeats, args.warmup, args.time_limit)
+        summary = summarize(results)
+        report["solvers"][solver_name] = {"summary": summary, "cases": results}
+        print(f"{solver_name}: solved {summary['solved']}/{len(cases)}  "
+              f"time p50 {summary['time_p50']:.3f}s p90 {summary['time_p90']:.3f}s  "
+              f"{summary['nodes_per_sec_p50']:.0f} nodes/s  "
+              f"peak p50 {summary['peak_kb_p50']:.0f} KB max {summary['peak_kb_max']:.0f} KB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regression over {args.threshold:g}% against {args.baseline}")
@@ -0,0 +1,593 @@
+"""
+Headless board used by the solvers
+
+Cards are coded as integers (suit * 13 + rank, following the order in card_order), slots are plain lists of codes
+(bottom card first) and foundations only keep their top card. Nothing here touches pygame, so a search can run on a
+board copied from the GameplayScreen, or dealt from a seed, without a display.
+
+Moves use the same index form as translate_solution_to_index: (source slot, card, target) where targets 0-12 are
+slots and 13-16 are foundations, except the card is a code instead of a Card sprite.
+
+Every board keeps a 64 bit Zobrist hash of its position that apply() and undo() update in O(cards moved), the
+solvers use it as the state key instead of building tuples. Slots are interchangeable (any slot can take a card
+from any other) and each foundation holds a single suit, so the hash doesn't depend on slot or foundation order:
+positions that only differ by a permutation are one state for the search. canonical_key() is the matching exact
+key and to_canonical() / from_canonical() map moves through the permutation.
+
+Move generation is indexed the same way: a bitmask of slots per top card rank gives the targets of a card without
+scanning every slot, and the stack starts of each slot are cached until the slot changes. Both are updated by the
+few methods that change a slot, so legal_moves() costs about one step per move found.
+
+The heuristic terms that look at every card (BoardHeuristics.blocked_cards and sequential_progress) are kept the
+same way. A move only adds or removes cards at the top of a slot, so each slot keeps running counts of its bad pairs
+from the bottom up, cut back to the cards still in place when the slot changes and extended on the next read. The
+totals over all slots are only refreshed for the slots changed since the last read, which makes the terms cost the
+cards moved instead of every card on the board.
+"""
+import random
+
+from src.utils.card_order import SUITS, RANKS, SUIT_VALUE, RANK_VALUE
+
+NUM_SLOTS = 13
+NUM_FOUNDATIONS = 4
+NUM_RANKS = 13
+NUM_CARDS = 52
+EMPTY = -1
+KING = NUM_RANKS - 1
+SEPARATOR = 255  # Ends each slot in pack()
+
+MASK_64 = (1 << 64) - 1
+
+# Zobrist tables, fixed seed so hashes are the same in every process
+_zobrist_random = random.Random(0x5EED)
+# One number per (height in the slot, card), a slot hashes to the xor of its cards
+ZOBRIST_SLOTS = [_zobrist_random.getrandbits(64) for _ in range(NUM_CARDS * NUM_CARDS)]
+# One number per foundation top card, the entry for EMPTY is 0
+ZOBRIST_FOUNDATIONS = [0] + [_zobrist_random.getrandbits(64) for _ in range(NUM_CARDS)]
+
+
+def slot_zobrist(height, code):
+    return ZOBRIST_SLOTS[height * NUM_CARDS + code]
+
+
+def foundation_zobrist(code):
+    return ZOBRIST_FOUNDATIONS[code + 1]
+
+
+def encode(suit, rank):
+    """
+    Encodes a card
+    :param suit: Suit name ("Hearts", ...)
+    :param rank: Rank name ("Ace", ..., "King")
+    :return: The card code
+    """
+    return SUIT_VALUE[suit] * NUM_RANKS + RANK_VALUE[rank]
+
+
+def card_rank(code):
+    return code % NUM_RANKS
+
+
+def card_suit(code):
+    return code // NUM_RANKS
+
+
+def is_red(code):
+    return code < 2 * NUM_RANKS  # Hearts and Diamonds come first
+
+
+def card_name(code):
+    return f"{RANKS[card_rank(code)]} of {SUITS[card_suit(code)]}"
+
+
+class Board:
+    """
+    Integer coded copy of the game state with the same rules as CardSlot and check_auto_moves
+
+    Atributes:
+        slots: 13 lists of card codes, the last one is the top card
+        foundations: Top card code of each foundation, EMPTY if it has no cards
+        mv_rules: 1 if stacks must alternate colours (CardSlot.mv_rules)
+        sk_size: Max number of cards moved at once, 0 for no limit
+    """
+    def __init__(self, slots, foundations, mv_rules=0, sk_size=0):
+        self.slots = [list(slot) for slot in slots]
+        self.foundations = list(foundations)
+        self.mv_rules = mv_rules
+        self.sk_size = sk_size
+        self._reset_hash()
+        self._reset_index()
+
+    @classmethod
+    def from_screen(cls, gameplay_screen):
+        """
+        Copies the slots and foundations of a GameplayScreen
+        :param gameplay_screen: The GameplayScreen
+        :return: The new Board
+        """
+        slots = [[encode(card.suit, card.rank) for card in slot.cards] for slot in gameplay_screen.slots]
+        foundations = []
+        for foundation in gameplay_screen.foundations:
+            card = foundation.top_card()
+            foundations.append(EMPTY if card is None else encode(card.suit, card.rank))
+
+        first_slot = gameplay_screen.slots[0]
+        sk_size = first_slot.sk_size if first_slot.sk_size < NUM_CARDS else 0
+        return cls(slots, foundations, mv_rules=first_slot.mv_rules, sk_size=sk_size)
+
+    @classmethod
+    def from_json(cls, json_data, mv_rules=0, sk_size=0):
+        """
+        Reads the save format of GameLoader.generate_json
+        :param json_data: Dict with "slots" and "foundations"
+        :return: The new Board
+        """
+        slots = [[encode(card["suit"], card["rank"]) for card in cards] for cards in json_data["slots"].values()]
+        slots += [[] for _ in range(NUM_SLOTS - len(slots))]
+        foundations = [EMPTY] * NUM_FOUNDATIONS
+        for f, cards in enumerate(json_data["foundations"].values()):
+            if cards:
+                foundations[f] = max(encode(card["suit"], card["rank"]) for card in cards)
+        return cls(slots, foundations, mv_rules=mv_rules, sk_size=sk_size)
+
+    def to_json(self):
+        """
+        Writes the save format of GameLoader.generate_json
+        :return: Dict with "slots" and "foundations"
+        """
+        def as_dict(code):
+            return {"suit": SUITS[card_suit(code)], "rank": RANKS[card_rank(code)]}
+
+        slots = {f"s{i + 1}": [as_dict(code) for code in cards] for i, cards in enumerate(self.slots)}
+        foundations = {}
+        for f, top in enumerate(self.foundations):
+            codes = [] if top == EMPTY else range(top - card_rank(top), top + 1)
+            foundations[f"f{f + 1}"] = [as_dict(code) for code in codes]
+        return {"slots": slots, "foundations": foundations}
+
+    @classmethod
+    def deal(cls, seed=None, mv_rules=0, sk_size=0):
+        """
+        Deals a new game the same way as Cards.shuffle(seed) followed by deal_cards
+        :param seed: Seed for the shuffle, None for a random one
+        :return: The new Board
+        """
+        deck = list(range(NUM_CARDS))
+        random.Random(seed).shuffle(deck)
+        slots = [[] for _ in range(NUM_SLOTS)]
+        for i, code in enumerate(deck):
+            slots[i % NUM_SLOTS].append(code)
+        # Same as CardSlot.push_king_to_top
+        slots = [[c for c in slot if card_rank(c) == KING] + [c for c in slot if card_rank(c) != KING]
+                 for slot in slots]
+        return cls(slots, [EMPTY] * NUM_FOUNDATIONS, mv_rules=mv_rules, sk_size=sk_size)
+
+    @staticmethod
+    def card_lookup(gameplay_screen):
+        """
+        Maps every card code to the Card sprite it stands for in the GameplayScreen
+        :param gameplay_screen: The GameplayScreen
+        :return: Dict code -> Card
+        """
+        lookup = {}
+        for slot in gameplay_screen.slots + gameplay_screen.foundations:
+            for card in slot.cards:
+                lookup[encode(card.suit, card.rank)] = card
+        return lookup
+
+    def to_screen(self, gameplay_screen):
+        """
+        Moves the Card sprites of a GameplayScreen so that it shows this board
+        :param gameplay_screen: The GameplayScreen
+        """
+        lookup = self.card_lookup(gameplay_screen)
+        for slot, codes in zip(gameplay_screen.slots, self.slots):
+            slot.cards = [lookup[code] for code in codes]
+            slot.reposition_cards()
+        for foundation, top in zip(gameplay_screen.foundations, self.foundations):
+            if top == EMPTY:
+                foundation.cards = []
+            else:
+                first = top - card_rank(top)
+                foundation.cards = [lookup[code] for code in range(first, top + 1)]
+            foundation.reposition_cards()
+
+    def copy(self):
+        return Board(self.slots, self.foundations, self.mv_rules, self.sk_size)
+
+    @staticmethod
+    def _slot_hash(cards):
+        value = 0
+        for height, code in enumerate(cards):
+            value ^= slot_zobrist(height, code)
+        return value
+
+    def compute_hash(self):
+        """
+        Zobrist hash computed from scratch, apply() and undo() keep self.hash equal to it
+
+        Slot hashes are added up (mod 2**64) and foundation tops xor-ed, both ignore order.
+        :return: 64 bit int
+        """
+        slot_sum = sum(self._slot_hash(cards) for cards in self.slots) & MASK_64
+        foundation_hash = 0
+        for top in self.foundations:
+            foundation_hash ^= foundation_zobrist(top)
+        return slot_sum ^ foundation_hash
+
+    def _reset_hash(self):
+        self.slot_hashes = [self._slot_hash(cards) for cards in self.slots]
+        self.slot_sum = sum(self.slot_hashes) & MASK_64
+        self.foundation_hash = 0
+        for top in self.foundations:
+            self.foundation_hash ^= foundation_zobrist(top)
+        self.hash = self.slot_sum ^ self.foundation_hash
+
+    def _reset_index(self):
+        # Rank -> bitmask of the slots whose top card has that rank
+        self.tops_by_rank = [0] * NUM_RANKS
+        for i, cards in enumerate(self.slots):
+            if cards:
+                self.tops_by_rank[card_rank(cards[-1])] |= 1 << i
+        self.starts = [None] * NUM_SLOTS  # stack_starts() of each slot, None until asked for
+        # Per slot, (blocked, not descending) pairs among the cards up to each height, None until pair_terms()
+        self.pair_counts = [None] * NUM_SLOTS
+        self.pairs_valid = [1] * NUM_SLOTS  # Cards still counted right in pair_counts
+        self.slot_terms = [(0, False)] * NUM_SLOTS  # (blocked pairs, descending) last added to the totals
+        self.blocked_total = 0
+        self.descending_total = 0
+        self.dirty_slots = (1 << NUM_SLOTS) - 1  # Bitmask of the slots to refresh in the totals
+
+    def _slot_changed(self, slot, old_top):
+        """
+        Updates the move and heuristic indexes after a slot changed
+        :param old_top: Its top card before the change, None if it was empty
+        """
+        cards = self.slots[slot]
+        new_top = cards[-1] if cards else None
+        if new_top != old_top:
+            bit = 1 << slot
+            if old_top is not None:
+                self.tops_by_rank[card_rank(old_top)] ^= bit
+            if new_top is not None:
+                self.tops_by_rank[card_rank(new_top)] ^= bit
+        self.starts[slot] = None
+        # Cards only come and go at the top: when the slot grew its old cards are all still in place
+        if len(cards) < self.pairs_valid[slot]:
+            self.pairs_valid[slot] = max(len(cards), 1)
+        self.dirty_slots |= 1 << slot
+
+    def _set_slot_hash(self, slot, value):
+        self.slot_sum = (self.slot_sum - self.slot_hashes[slot] + value) & MASK_64
+        self.slot_hashes[slot] = value
+
+    def top(self, index):
+        cards = self.slots[index]
+        return cards[-1] if cards else None
+
+    def foundation_count(self):
+        return sum(card_rank(top) + 1 for top in self.foundations if top != EMPTY)
+
+    def is_win(self):
+        return self.foundation_count() == NUM_CARDS
+
+    def foundation_for(self, code):
+        """
+        Finds the foundation that accepts a card (first empty one for Aces)
+        :param code: The card code
+        :return: Index of the foundation, None if no foundation accepts it
+        """
+        if card_rank(code) == 0:
+            for f, top in enumerate(self.foundations):
+                if top == EMPTY:
+                    return f
+            return None
+        for f, top in enumerate(self.foundations):
+            if top == code - 1:
+                return f
+        return None
+
+    def can_accept(self, target, code):
+        """
+        Same rules as CardSlot.can_accept_card
+        :param target: Target index (slots 0-12, foundations 13-16)
+        :param code: The card code
+        :return: True if the card can be dropped there
+        """
+        if target >= NUM_SLOTS:
+            top = self.foundations[target - NUM_SLOTS]
+            if top == EMPTY:
+                return card_rank(code) == 0
+            return card_rank(code) != 0 and top == code - 1
+        cards = self.slots[target]
+        return bool(cards) and card_rank(cards[-1]) == card_rank(code) + 1
+
+    def stack_starts(self, index):
+        """
+        Indexes of the cards that can be picked up with everything above them, top card first
+
+        Same checks as CardSlot.get_stack_from_card: descending ranks and alternating colours if mv_rules is 1.
+        :param index: The slot index
+        :return: List of indexes into the slot, cached until the slot changes so it must not be modified
+        """
+        starts = self.starts[index]
+        if starts is None:
+            starts = self.starts[index] = self._stack_starts(index)
+        return starts
+
+    def _slot_pairs(self, index):
+        """
+        :return: (blocked pairs, not descending pairs) of a slot, see BoardHeuristics.blocked_cards
+        """
+        cards = self.slots[index]
+        counts = self.pair_counts[index]
+        if counts is None:
+            counts = self.pair_counts[index] = [(0, 0)]
+        valid = self.pairs_valid[index]
+        if len(counts) > valid:
+            del counts[valid:]
+        blocked, breaks = counts[-1]
+        for height in range(valid, len(cards)):
+            lower, upper = cards[height - 1], cards[height]
+            descending = card_rank(lower) == card_rank(upper) + 1
+            if not (descending and card_suit(lower) != card_suit(upper)):
+                blocked += 1
+            if not descending:
+                breaks += 1
+            counts.append((blocked, breaks))
+        self.pairs_valid[index] = max(len(cards), 1)
+        return counts[len(cards) - 1] if cards else counts[0]
+
+    def pair_terms(self):
+        """
+        :return: (BoardHeuristics.blocked_cards, BoardHeuristics.sequential_progress) of the board, only the
+        slots changed since the last call are counted again
+        """
+        dirty = self.dirty_slots
+        while dirty:
+            bit = dirty & -dirty
+            dirty ^= bit
+            slot = bit.bit_length() - 1
+            old_blocked, old_descending = self.slot_terms[slot]
+            blocked, breaks = self._slot_pairs(slot)
+            descending = len(self.slots[slot]) >= 2 and breaks == 0
+            self.blocked_total += blocked - old_blocked
+            self.descending_total += descending - old_descending
+            self.slot_terms[slot] = (blocked, descending)
+        self.dirty_slots = 0
+        return self.blocked_total, self.descending_total
+
+    def _stack_starts(self, index):
+        cards = self.slots[index]
+        if not cards:
+            return []
+        max_stack = self.sk_size if self.sk_size else len(cards)
+        starts = [len(cards) - 1]
+        i = len(cards) - 2
+        while i >= 0 and len(starts) < max_stack:
+            upper, lower = cards[i], cards[i + 1]
+            if card_rank(upper) != card_rank(lower) + 1:
+                break
+            if self.mv_rules == 1 and is_red(upper) == is_red(lower):
+                break
+            starts.append(i)
+            i -= 1
+        return starts
+
+    def legal_moves(self):
+        """
+        Every slot -> slot and slot -> foundation move
+        :return: List of (source, code, target)
+        """
+        moves = []
+        tops_by_rank = self.tops_by_rank
+        for source, cards in enumerate(self.slots):
+            if not cards:
+                continue
+            for start in self.stack_starts(source):
+                code = cards[start]
+                rank = card_rank(code)
+                if rank == KING:
+                    continue
+                targets = tops_by_rank[rank + 1] & ~(1 << source)
+                while targets:
+                    bit = targets & -targets
+                    moves.append((source, code, bit.bit_length() - 1))
+                    targets ^= bit
+            f = self.foundation_for(cards[-1])
+            if f is not None:
+                moves.append((source, cards[-1], NUM_SLOTS + f))
+        return moves
+
+    def auto_moves(self):
+        """
+        Same rule as check_auto_moves: with every foundation started, top cards one rank above the lowest
+        foundation are safe to send, otherwise only Aces are
+        :return: List of (slot index, code)
+        """
+        wanted = self.auto_rank()
+        return [(i, cards[-1]) for i, cards in enumerate(self.slots) if cards and card_rank(cards[-1]) == wanted]
+
+    def auto_rank(self):
+        """
+        :return: Rank that check_auto_moves sends to the foundations (0 for Aces while a foundation is empty)
+        """
+        if EMPTY in self.foundations:
+            return 0
+        return min(card_rank(top) for top in self.foundations) + 1
+
+    def play_auto_moves(self):
+        """
+        Sends cards to the foundations until check_auto_moves has nothing left, like the gameplay loop does
+        between moves
+        :return: Journal of (slot, foundation, previous top) to be reverted by undo
+        """
+        journal = []
+        to_update = self.auto_moves()
+        while to_update:
+            for i, code in to_update:
+                f = self.foundation_for(code)
+                journal.append((i, f, self.foundations[f]))
+                self._to_foundation(i, f)
+            to_update = self.auto_moves()
+        return journal
+
+    def _to_foundation(self, slot, foundation):
+        cards = self.slots[slot]
+        code = cards.pop()
+        self._slot_changed(slot, code)
+        self._set_slot_hash(slot, self.slot_hashes[slot] ^ slot_zobrist(len(cards), code))
+        self.foundation_hash ^= foundation_zobrist(self.foundations[foundation]) ^ foundation_zobrist(code)
+        self.foundations[foundation] = code
+        self.hash = self.slot_sum ^ self.foundation_hash
+
+    def _from_foundation(self, slot, foundation, previous):
+        cards = self.slots[slot]
+        code = self.foundations[foundation]
+        self._set_slot_hash(slot, self.slot_hashes[slot] ^ slot_zobrist(len(cards), code))
+        self.foundation_hash ^= foundation_zobrist(code) ^ foundation_zobrist(previous)
+        self.foundations[foundation] = previous
+        old_top = cards[-1] if cards else None
+        cards.append(code)
+        self._slot_changed(slot, old_top)
+        self.hash = self.slot_sum ^ self.foundation_hash
+
+    def _move_stack(self, source, target, moved):
+        from_cards, to_cards = self.slots[source], self.slots[target]
+        start = len(from_cards) - moved
+        source_hash, target_hash = self.slot_hashes[source], self.slot_hashes[target]
+        for offset, code in enumerate(from_cards[start:]):
+            source_hash ^= slot_zobrist(start + offset, code)
+            target_hash ^= slot_zobrist(len(to_cards) + offset, code)
+        self._set_slot_hash(source, source_hash)
+        self._set_slot_hash(target, target_hash)
+        self.hash = self.slot_sum ^ self.foundation_hash
+        old_target_top = to_cards[-1] if to_cards else None
+        old_source_top = from_cards[-1]
+        to_cards.extend(from_cards[start:])
+        del from_cards[start:]
+        self._slot_changed(target, old_target_top)
+        self._slot_changed(source, old_source_top)
+
+    def apply(self, move):
+        """
+        Plays a move followed by the auto moves it unlocks
+        :param move: (source, code, target)
+        :return: Undo record for undo()
+        """
+        source, code, target = move
+        cards = self.slots[source]
+        if target >= NUM_SLOTS:
+            f = target - NUM_SLOTS
+            previous = self.foundations[f]
+            self._to_foundation(source, f)
+            moved = 1
+        else:
+            previous = None
+            moved = len(cards) - cards.index(code)
+            self._move_stack(source, target, moved)
+        return source, target, moved, previous, self.play_auto_moves()
+
+    def undo(self, record):
+        """
+        Reverts apply() exactly, auto moves included
+        :param record: The undo record returned by apply()
+        """
+        source, target, moved, previous, journal = record
+        for i, f, top in reversed(journal):
+            self._from_foundation(i, f, top)
+        if target >= NUM_SLOTS:
+            self._from_foundation(source, target - NUM_SLOTS, previous)
+        else:
+            self._move_stack(target, source, moved)
+
+    def key(self):
+        """
+        Exact state key, suits included
+        :return: Hashable tuple
+        """
+        return tuple(tuple(cards) for cards in self.slots) + (tuple(self.foundations),)
+
+    def canonical_order(self):
+        """
+        Slot indexes sorted by content, canonical slot i is slot order[i] of this board
+        :return: List of 13 slot indexes
+        """
+        return sorted(range(NUM_SLOTS), key=self.slots.__getitem__)
+
+    def canonical_key(self):
+        """
+        Exact key of the position with sorted slots and foundations, equal for positions that only differ by
+        the order of their slots or foundations (the same positions self.hash can't tell apart)
+        :return: Hashable tuple
+        """
+        slots = tuple(sorted(tuple(cards) for cards in self.slots))
+        return slots + (tuple(sorted(self.foundations)),)
+
+    def fingerprint(self):
+        """
+        canonical_key() and the stack rules as a string, for keys stored on disk
+        :return: "mv_rules.sk_size.hex of the sorted, packed position"
+        """
+        board = Board(sorted(self.slots), sorted(self.foundations))
+        return f"{self.mv_rules}.{self.sk_size}.{board.pack().hex()}"
+
+    def to_canonical(self, moves):
+        """
+        Maps moves played from this board to the canonical slot order. Foundation targets become 13 + suit since
+        which foundation gets a suit depends on the order the Aces came in
+        :param moves: List of (source, code, target)
+        :return: List of canonical moves
+        """
+        position = {slot: i for i, slot in enumerate(self.canonical_order())}
+        canonical = []
+        for source, code, target in moves:
+            target = NUM_SLOTS + card_suit(code) if target >= NUM_SLOTS else position[target]
+            canonical.append((position[source], code, target))
+        return canonical
+
+    def from_canonical(self, moves):
+        """
+        Maps canonical moves (see to_canonical) back to moves for this board
+        :param moves: List of canonical (source, code, target)
+        :return: List of (source, code, target)
+        """
+        order = self.canonical_order()
+        board = self.copy()
+        real = []
+        for source, code, target in moves:
+            if target >= NUM_SLOTS:
+                target = NUM_SLOTS + board.foundation_for(code)
+            else:
+                target = order[target]
+            move = (order[source], code, target)
+            board.apply(move)
+            real.append(move)
+        return real
+
+    def pack(self):
+        """
+        Compact snapshot of the position (about 70 bytes) for search frontiers
+        :return: bytes, read back with unpack()
+        """
+        data = bytearray()
+        for cards in self.slots:
+            data.extend(cards)
+            data.append(SEPARATOR)
+        data.extend(top + 1 for top in self.foundations)
+        return bytes(data)
+
+    @classmethod
+    def unpack(cls, data, mv_rules=0, sk_size=0):
+        """
+        Rebuilds a board from pack()
+        :param data: The snapshot
+        :return: The new Board
+        """
+        *slots, foundations = data.split(bytes((SEPARATOR,)))
+        return cls([list(cards) for cards in slots], [top - 1 for top in foundations], mv_rules, sk_size)
+
+    def __str__(self):
+        lines = [", ".join(card_name(code) for code in cards) for cards in self.slots]
+        lines.append(" | ".join("-" if top == EMPTY else card_name(top) for top in self.foundations))
+        return "\n".join(lines)
@@ -0,0 +1,114 @@
+"""
+Static detection of lost positions
+
+A card can only leave its slot once the cards above it have left (or are carried off in a stack with it), and then
+only one of three ways:
+    - to a foundation, once nothing is above it and every lower card of its suit has left for the foundations
+    - onto a card one rank higher that is on top of a slot: that card must not lie under it in its own slot, and
+      the cards above that card must have left first
+    - carried in a stack by the card under it, if that card can leave and the two make a valid stack
+find_deadlock() works out which cards can ever leave by repeating these rules from an empty set until nothing
+changes. A card left out can never leave its slot, so the position is lost, whatever the search does. The rules
+only ever ask for less than the game does, so a solvable position is never reported as lost. The common case is a
+card buried under a higher card of its own suit that has nowhere else to go.
+
+find_deadlock() checks a whole board in a fraction of a millisecond: once per deal before any search, and through
+creates_deadlock() as a pruning test for the slot -> slot moves of DFS and IDA* (see pruning). Deals are hardly ever
+lost from the start, but with single card moves (Hard) most random lines of play walk into a lost position.
+
+The pruning test checks the whole board again after each move, nothing is carried over from the parent: whether a
+card can leave depends on cards in any slot (the card it would go on, the lower cards of its suit), so one move can
+change the answer for cards far from the two slots it touches, and a fixpoint kept up to date per slot would cost
+about as much as starting over.
+"""
+from src.ai.board import NUM_RANKS, NUM_SLOTS, card_rank, card_suit, is_red
+
+
+def card_positions(board):
+    """
+    :return: Dict card code -> (slot, height) for the cards in the slots
+    """
+    return {code: (i, height) for i, cards in enumerate(board.slots) for height, code in enumerate(cards)}
+
+
+def stacks_on(board, lower, upper):
+    """
+    True if upper can sit on lower in a moving stack (CardSlot.get_stack_from_card), ignoring the stack size
+    """
+    if board.sk_size == 1 or card_rank(lower) != card_rank(upper) + 1:
+        return False
+    return board.mv_rules == 0 or is_red(lower) != is_red(upper)
+
+
+def find_deadlock(board):
+    """
+    Looks for cards that can never leave their slot, see the module docstring
+    :return: List of those card codes, None if every card may still leave
+    """
+    positions = card_positions(board)
+    slots = board.slots
+    left = set()
+    # Per slot, height of the highest card not known to leave: the cards above it can all leave
+    blocked = [len(cards) - 1 for cards in slots]
+    # Per suit, lowest card still in a slot and not known to leave
+    lowest = [min((code for code in positions if card_suit(code) == suit), default=None) for suit in range(4)]
+
+    def can_leave(code, slot, height):
+        cards = slots[slot]
+        rank = card_rank(code)
+        if height == blocked[slot] and lowest[card_suit(code)] == code:
+            return True  # To a foundation
+        if height > 0 and cards[height - 1] in left and stacks_on(board, cards[height - 1], code):
+            return True  # Carried by the card under it
+        if rank + 1 == NUM_RANKS:
+            return False
+        for suit in range(4):
+            target = suit * NUM_RANKS + rank + 1
+            if target not in positions:
+                continue
+            target_slot, target_height = positions[target]
+            if target_slot == slot and (target_height < height or target not in left):
+                continue  # Under it until it leaves, or above it and stuck
+            if blocked[target_slot] <= target_height:
+                return True
+        return False
+
+    changed = True
+    while changed:
+        changed = False
+        for slot, cards in enumerate(slots):
+            # Only the stack that reaches the highest blocked card may leave next, the cards under it can't
+            height = blocked[slot]
+            while height >= 0:
+                code = cards[height]
+                if code in left or not can_leave(code, slot, height):
+                    if height == 0 or not stacks_on(board, cards[height - 1], code):
+                        break
+                    height -= 1
+                    continue
+                left.add(code)
+                changed = True
+                while blocked[slot] >= 0 and cards[blocked[slot]] in left:
+                    blocked[slot] -= 1
+                suit = card_suit(code)
+                while lowest[suit] is not None and (lowest[suit] in left or lowest[suit] not in positions):
+                    lowest[suit] = lowest[suit] + 1 if card_rank(lowest[suit]) + 1 < NUM_RANKS else None
+                height = blocked[slot]
+
+    if len(left) == len(positions):
+        return None
+    return [code for code in positions if code not in left]
+
+
+def creates_deadlock(board, move):
+    """
+    Pruning test for a search, a full find_deadlock() on the board after the move, which is left as it was
+    :param move: (source, code, target) about to be played
+    :return: True if the board after a slot -> slot move is lost (foundation moves are not tested)
+    """
+    if move[2] >= NUM_SLOTS:
+        return False
+    record = board.apply(move)
+    deadlock = find_deadlock(board)
+    board.undo(record)
+    return deadlock is not None
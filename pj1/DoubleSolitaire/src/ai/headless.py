@@ -0,0 +1,130 @@
+"""
+Runs the solvers without a GameplayScreen, for batch runs and benchmarks
+
+The solvers only read the suit and rank of the cards in gameplay_screen.slots / foundations (Board.from_screen), so
+HeadlessScreen gives them plain card tuples built from a Board instead of sprites.
+"""
+import io
+import time
+from collections import namedtuple
+from contextlib import redirect_stdout
+
+try:
+    import resource
+except ImportError:  # Not on Windows
+    resource = None
+
+from src.ai.board import EMPTY, card_rank, card_suit
+from src.ai.background import SearchProgress, SearchCancelled
+from src.ai.instrumentation import SearchStats
+from src.utils.card_order import SUITS, RANKS
+
+HeadlessCard = namedtuple("HeadlessCard", ["suit", "rank"])
+
+
+def headless_card(code):
+    return HeadlessCard(SUITS[card_suit(code)], RANKS[card_rank(code)])
+
+
+class HeadlessSlot:
+    """
+    The parts of a CardSlot the solvers read
+    """
+    def __init__(self, cards, mv_rules=0, sk_size=0):
+        self.cards = cards
+        self.mv_rules = mv_rules
+        self.sk_size = sk_size
+
+    def top_card(self):
+        return self.cards[-1] if self.cards else None
+
+
+class HeadlessScreen:
+    """
+    Stand-in for a GameplayScreen showing a Board
+    """
+    def __init__(self, board):
+        self.slots = [HeadlessSlot([headless_card(code) for code in cards], board.mv_rules, board.sk_size)
+                      for cards in board.slots]
+        self.foundations = []
+        for top in board.foundations:
+            cards = [] if top == EMPTY else [headless_card(code) for code in range(top - card_rank(top), top + 1)]
+            self.foundations.append(HeadlessSlot(cards))
+        self.is_lose = False
+
+
+class DeadlineProgress(SearchProgress):
+    """
+    SearchProgress that cancels the search once time_limit seconds have passed, for solvers without a time limit
+    of their own
+    """
+    def __init__(self, time_limit=None, stats=None, profile="off"):
+        super().__init__(stats, profile)
+        self.time_limit = time_limit
+        self.timed_out = False
+
+    def update(self, depth):
+        if self.nodes % 256 == 0:
+            self._check_deadline()
+        super().update(depth)
+
+    def check(self):
+        self._check_deadline()
+        super().check()
+
+    def _check_deadline(self):
+        if self.time_limit is not None and self.elapsed > self.time_limit:
+            self.timed_out = True
+            self.cancel()
+
+
+def peak_memory_kb():
+    """
+    :return: Peak resident memory of this process in KB, None where the resource module is missing
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_solver(solver_class, board, time_limit=None, instrument=False, profile="off", **kwargs):
+    """
+    Solves a board with the solver's output silenced and checks the solution by replaying it
+    :param solver_class: A BoardSolver subclass
+    :param board: The Board to solve, left untouched
+    :param time_limit: Seconds before the search is cancelled, None for no limit
+    :param instrument: If True the result also has the SearchStats of the search, under "stats"
+    :param profile: Memory profiling level, see profiling
+    :param kwargs: Passed to the solver
+    :return: (dict with solved, timed_out, moves, nodes, time, memory_kb and the branching factor before and after
+    pruning (None for solvers that don't prune), the solver or None if it was cancelled)
+    """
+    progress = DeadlineProgress(time_limit, SearchStats() if instrument else None, profile)
+    start_time = time.perf_counter()
+    solver = None
+    with redirect_stdout(io.StringIO()):
+        try:
+            solver = solver_class(HeadlessScreen(board), progress=progress, **kwargs)
+        except SearchCancelled:
+            pass
+    elapsed = time.perf_counter() - start_time
+
+    moves = solver.solution_path if solver is not None else []
+    replay = board.copy()
+    replay.play_auto_moves()
+    for move in moves:
+        replay.apply(move)
+
+    result = {
+        "solved": replay.is_win(),
+        "timed_out": progress.timed_out,
+        "moves": len(moves),
+        "nodes": progress.nodes,
+        "time": elapsed,
+        "memory_kb": progress.peak_kb,
+        "branching_before": progress.pruning["branching_before"] if progress.pruning else None,
+        "branching_after": progress.pruning["branching_after"] if progress.pruning else None,
+    }
+    if instrument:
+        result["stats"] = progress.stats.as_dict()
+    return result, solver
@@ -1,6 +1,6 @@
-from src.elements.card_slot import CardSlot
 from src.utils.card_order import rank_index
 from src.utils.card_order import is_prev_rank
+from src.ai.board import EMPTY, KING, card_rank, card_suit
   
 class Heuristics:
     def __init__(self, game):
@@ -123,3 +123,107 @@ class Heuristics:
 
 
             return cards_foundation + available_moves + distance + blocked_cards + sequential_progress
+
+
+class BoardHeuristics:
+    """
+    Same terms as Heuristics computed on a headless Board (see src/ai/board.py)
+    """
+    @staticmethod
+    def cards_in_foundation(board):
+        return board.foundation_count()
+
+    @staticmethod
+    def available_moves(board):
+        available_moves = 0
+        for cards in board.slots:
+            if not cards:
+                continue
+            card = cards[-1]
+            if card_rank(card) != KING:
+                # Slots whose top is one rank higher, never its own slot
+                available_moves += board.tops_by_rank[card_rank(card) + 1].bit_count()
+            if board.foundation_for(card) is not None:
+                available_moves += 1
+        return available_moves
+
+    @staticmethod
+    def distance_to_foundation(board):
+        # Bitmask of the ranks on top of a slot, the closest one at or above a foundation is its lowest bit there
+        top_ranks = 0
+        for rank, slots in enumerate(board.tops_by_rank):
+            if slots:
+                top_ranks |= 1 << rank
+        closest_distance = 13
+        for top in board.foundations:
+            if top == EMPTY:
+                continue
+            above = top_ranks >> card_rank(top)
+            if above:
+                closest_distance = min(closest_distance, (above & -above).bit_length() - 1)
+        return 13 - closest_distance
+
+    @staticmethod
+    def blocked_cards(board):
+        """
+        Pairs of cards on each other that are not one rank apart in different suits, kept by the board per slot
+        """
+        return board.pair_terms()[0]
+
+    @staticmethod
+    def sequential_progress(board):
+        """
+        Slots of two cards or more whose ranks go down one by one, kept by the board per slot
+        """
+        return board.pair_terms()[1]
+
+    @staticmethod
+    def cards_left(board):
+        """
+        Cards not on the foundations. Goal directed but not admissible, one move can set off several auto moves
+        """
+        return 52 - board.foundation_count()
+
+    @staticmethod
+    def blocked_slots(board):
+        """
+        Slots holding a card above a lower card of the same suit. That card can only leave through a move from
+        its slot, and a move has a single source, so each of these slots costs at least one move
+        """
+        blocked = 0
+        for cards in board.slots:
+            lowest = [13] * 4
+            for code in cards:
+                suit, rank = card_suit(code), card_rank(code)
+                if rank > lowest[suit]:
+                    blocked += 1
+                    break
+                lowest[suit] = rank
+        return blocked
+
+    @staticmethod
+    def lower_bound(board):
+        """
+        Admissible and consistent estimate of the moves left, used as h by AStar and IDAStar
+        """
+        if board.is_win():
+            return 0
+        return max(BoardHeuristics.blocked_slots(board), 1)
+
+    @staticmethod
+    def beam_score(board):
+        """
+        Cards not on the foundations plus the blocked slots, lower is better. Ranks the children kept by BeamSearch
+        """
+        return BoardHeuristics.cards_left(board) + BoardHeuristics.blocked_slots(board)
+
+    @staticmethod
+    def weighted_combination(board):
+        cards_foundation = BoardHeuristics.cards_in_foundation(board) * 1.5
+        available_moves = BoardHeuristics.available_moves(board) * 1.0
+        distance = BoardHeuristics.distance_to_foundation(board) * 1.0
+        blocked, descending = board.pair_terms()
+        blocked_cards = blocked * 1.0
+        sequential_progress = descending * 1.5
+
+        return cards_foundation + available_moves + distance + blocked_cards + sequential_progress
@@ -0,0 +1,75 @@
+"""
+Opt-in per-phase counters for the solvers
+
+A SearchStats given to SearchProgress(stats=...) is picked up by the solver, which then times each call to the
+module level helpers of algorithms (get_possible_moves, apply_move, undo_move, get_state_key, load_snapshot and the
+heuristics) and counts nodes, duplicates, depth, branching factor and frontier size. Without one the helpers skip
+all of it, so the cost is a single None check per call.
+"""
+from collections import Counter
+from time import perf_counter
+
+
+class SearchStats:
+    """
+    Counters of one search, see as_dict() for the result
+
+    Atributes:
+        calls, seconds: Phase name -> number of calls / total time spent in it
+        nodes: Nodes expanded
+        duplicates: Generated states dropped because they were already seen (or reached for less)
+        max_depth: Deepest node expanded
+        branching: Number of moves -> how many nodes had that many
+        frontier: (nodes, frontier size) sampled every sample_every nodes
+    """
+    def __init__(self, sample_every=1024):
+        """
+        :param sample_every: Nodes between frontier size samples
+        """
+        self.sample_every = sample_every
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.nodes = 0
+        self.duplicates = 0
+        self.max_depth = 0
+        self.branching = Counter()
+        self.frontier = []
+
+    def timed(self, phase, start):
+        """
+        Adds a call to a phase
+        :param phase: Phase name
+        :param start: perf_counter() when the call began
+        """
+        self.seconds[phase] += perf_counter() - start
+        self.calls[phase] += 1
+
+    def node(self, depth, frontier_size):
+        """
+        Called once per node expanded
+        :param depth: Depth of the node
+        :param frontier_size: Open nodes (queue or stack length) at that point
+        """
+        if self.nodes % self.sample_every == 0:
+            self.frontier.append((self.nodes, frontier_size))
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def mean_branching(self):
+        total = sum(self.branching.values())
+        return sum(moves * count for moves, count in self.branching.items()) / total if total else 0.0
+
+    def as_dict(self):
+        """
+        :return: Plain dict (JSON friendly) with every counter
+        """
+        return {
+            "phases": {phase: {"calls": self.calls[phase], "seconds": self.seconds[phase]} for phase in self.calls},
+            "nodes": self.nodes,
+            "duplicates": self.duplicates,
+            "max_depth": self.max_depth,
+            "mean_branching": self.mean_branching(),
+            "branching": {str(moves): count for moves, count in sorted(self.branching.items())},
+            "frontier": self.frontier,
+        }
@@ -0,0 +1,257 @@
+"""
+Distance to goal heuristic learned from solved deals
+
+    python learn.py --seeds 0-199 --solver beam --rules medium --output learned.json
+    python solve.py --solver wastar --rules medium --heuristic learned.json
+
+Three steps, one function each:
+    - collect_positions() solves seeded deals headless (as solve.py does) and replays each solution, labelling every
+      position on it with the moves the solution still needed from there
+    - features() describes a board with the fixed list of numbers named in FEATURES
+    - fit() fits the labels on the features by least squares, with NumPy
+The model is a bias and one weight per feature, saved as JSON. LearnedHeuristic reads it back and has two
+evaluators that give the same scores. Called on a board it is a plain dot product, so weighted A* needs no NumPy:
+for a single board three multiplications are cheaper than a NumPy call. LearnedHeuristic.batch() computes the
+features of a whole list of packed boards with NumPy (see vectorized), which is what Beam Search uses to score a
+layer when NumPy is installed.
+
+Every feature grows with the work left and the weights are kept >= 0, so the estimate never rewards a move away
+from the goal. A free fit over more features (available moves, empty slots, ...) predicted the labels a little
+better, but it traded correlated features off against each other and the searches steered straight into those
+errors.
+
+The model is not admissible: the labels come from solutions that are rarely the shortest, so it estimates the moves
+a solver will make and often more than the fewest moves left. A* and IDA* only return the shortest solution with
+an h that never overestimates, so solve.py --heuristic only takes it for wastar and beam, which don't promise the
+shortest solution anyway.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # Only fit() and LearnedHeuristic.batch() need it
+    np = None
+
+from src.ai.batch import SOLVERS, RULES, parse_seeds
+from src.ai import vectorized
+from src.ai.board import EMPTY, NUM_CARDS, NUM_RANKS, Board, card_rank, card_suit
+from src.ai.deadlock import card_positions
+from src.ai.headless import run_solver
+from src.ai.heuristics import BoardHeuristics
+
+FEATURES = [
+    "cards_left",
+    "blocked_slots",
+    "cards_above_next",
+]
+
+
+def features(board):
+    """
+    :return: List of floats, one per name in FEATURES
+    """
+    # Cards above the next card of each suit, they all have to move before it can go up
+    placed = [0] * 4
+    for top in board.foundations:
+        if top != EMPTY:
+            placed[card_suit(top)] = card_rank(top) + 1
+    positions = card_positions(board)
+    above_next = 0
+    for suit in range(4):
+        if placed[suit] < NUM_RANKS:
+            slot, height = positions[suit * NUM_RANKS + placed[suit]]
+            above_next += len(board.slots[slot]) - height - 1
+    return [
+        float(BoardHeuristics.cards_left(board)),
+        float(BoardHeuristics.blocked_slots(board)),
+        float(above_next),
+    ]
+
+
+def batch_blocked_slots(slots):
+    """
+    BoardHeuristics.blocked_slots of every encoded position (see vectorized.encode)
+    :return: (N,) array
+    """
+    present = slots != EMPTY
+    # (N, NUM_SLOTS, 4, height) ranks of each suit's cards, NUM_RANKS where the card is of another suit or missing
+    ranks = np.where(present[:, :, None, :] & (slots[:, :, None, :] // NUM_RANKS == np.arange(4)[:, None]),
+                     slots[:, :, None, :] % NUM_RANKS, NUM_RANKS)
+    lowest = np.minimum.accumulate(ranks, axis=3)
+    below = np.concatenate([np.full(ranks.shape[:3] + (1,), NUM_RANKS), lowest[..., :-1]], axis=3)
+    return ((ranks < NUM_RANKS) & (ranks > below)).any(axis=(2, 3)).sum(axis=1)
+
+
+def batch_cards_above_next(slots, foundations):
+    """
+    The cards_above_next feature of every encoded position
+    :return: (N,) array
+    """
+    placed = np.zeros((len(slots), 4), dtype=np.int16)
+    for f in range(foundations.shape[1]):
+        rows = np.flatnonzero(foundations[:, f] != EMPTY)
+        tops = foundations[rows, f]
+        placed[rows, tops // NUM_RANKS] = tops % NUM_RANKS + 1
+    # Code of each suit's next card, -2 (matches nothing) once the suit is complete
+    wanted = np.where(placed < NUM_RANKS, np.arange(4) * NUM_RANKS + placed, -2)
+    heights = (slots != EMPTY).sum(axis=2)
+    above = heights[:, :, None] - np.arange(slots.shape[2]) - 1
+    found = slots[:, :, :, None] == wanted[:, None, None, :]
+    return np.where(found, above[..., None], 0).sum(axis=(1, 2, 3))
+
+
+def trace_deal(task):
+    """
+    Worker side: solves one seed and labels the positions along the solution
+    :param task: (seed, solver name, mv_rules, sk_size, time limit)
+    :return: List of (features, moves left), empty if the deal wasn't solved
+    """
+    seed, solver_name, mv_rules, sk_size, time_limit = task
+    solver_class, kwargs = SOLVERS[solver_name]
+    board = Board.deal(seed, mv_rules, sk_size)
+    result, solver = run_solver(solver_class, board, time_limit, **kwargs)
+    if not result["solved"]:
+        return []
+
+    rows = []
+    replay = board.copy()
+    replay.play_auto_moves()
+    moves = solver.solution_path
+    for i, move in enumerate(moves):
+        rows.append((features(replay), len(moves) - i))
+        replay.apply(move)
+    return rows
+
+
+def collect_positions(seeds, solver_name="beam", mv_rules=1, sk_size=0, time_limit=30.0, workers=None):
+    """
+    :return: Dict seed -> list of (features, moves left) for the deals that were solved
+    """
+    tasks = [(seed, solver_name, mv_rules, sk_size, time_limit) for seed in seeds]
+    with multiprocessing.Pool(max(workers or 1, 1), maxtasksperchild=1) as pool:
+        traces = pool.map(trace_deal, tasks)
+    return {seed: rows for seed, rows in zip(seeds, traces) if rows}
+
+
+def fit(rows, iterations=5000):
+    """
+    Least squares fit of moves left on the features with the weights kept >= 0 (projected gradient descent from
+    the free fit), the bias is free
+    :param rows: List of (features, moves left)
+    :param iterations: Gradient steps
+    :return: LearnedHeuristic
+    """
+    if np is None:
+        raise RuntimeError("fitting a learned heuristic needs NumPy (pip install numpy)")
+    x = np.array([[1.0] + list(row) for row, _ in rows])
+    y = np.array([float(label) for _, label in rows])
+    solution = np.linalg.lstsq(x, y, rcond=None)[0]
+    step = 1.0 / np.linalg.norm(x, 2) ** 2
+    for _ in range(iterations):
+        solution -= step * (x.T @ (x @ solution - y))
+        solution[1:] = np.maximum(solution[1:], 0.0)
+    return LearnedHeuristic(solution[1:].tolist(), float(solution[0]))
+
+
+def mean_error(heuristic, rows):
+    """
+    :return: Mean absolute error of a function features -> estimate over (features, moves left) rows
+    """
+    return sum(abs(heuristic(row) - label) for row, label in rows) / len(rows)
+
+
+class LearnedHeuristic:
+    """
+    Linear estimate of the moves left, see the module docstring. Instances are plain functions board -> estimate,
+    so they can be given as the heuristic of a weighted AStar or of BeamSearch, and batch() can be BeamSearch's
+    batch_heuristic. Not admissible, so not for AStar with weight 1 or IDAStar
+    """
+    def __init__(self, weights, bias, feature_names=None):
+        """
+        :param weights: One weight per feature in FEATURES
+        :param bias: Constant term
+        :param feature_names: Features the weights were fitted on, FEATURES by default
+        """
+        if (feature_names or FEATURES) != FEATURES or len(weights) != len(FEATURES):
+            raise ValueError("the model was fitted on other features, train it again with learn.py")
+        self.weights = list(weights)
+        self.bias = bias
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        return cls(data["weights"], data["bias"], data["features"])
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump({"features": FEATURES, "weights": self.weights, "bias": self.bias}, file, indent=2)
+
+    def estimate(self, row):
+        """
+        :param row: features() of a board
+        """
+        return self.bias + sum(weight * value for weight, value in zip(self.weights, row))
+
+    def __call__(self, board):
+        if board.is_win():
+            return 0
+        return max(self.estimate(features(board)), 1.0)
+
+    def batch(self, snapshots):
+        """
+        Same scores as calling the model on each board, computed for all of them at once with NumPy
+        :param snapshots: List of Board.pack() snapshots
+        :return: List of floats
+        """
+        if np is None:
+            raise RuntimeError("the batch evaluator needs NumPy (pip install numpy)")
+        if not snapshots:
+            return []
+        slots, foundations = vectorized.encode_packed(snapshots)
+        cards_left = NUM_CARDS - vectorized.cards_in_foundation(foundations)
+        rows = np.stack([cards_left, batch_blocked_slots(slots), batch_cards_above_next(slots, foundations)], axis=1)
+        estimates = np.maximum(self.bias + rows @ np.array(self.weights), 1.0)
+        return np.where(cards_left == 0, 0.0, estimates).tolist()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Learn a distance to goal heuristic from solved deals.")
+    parser.add_argument("--seeds", default="0-99", help='Seeds to deal, e.g. "0-199"')
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="beam", help="Solver whose solutions label")
+    parser.add_argument("--rules", choices=sorted(RULES), default="medium", help="Difficulty whose stack rules to use")
+    parser.add_argument("--time-limit", type=float, default=30.0, help="Seconds per deal before giving up")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes in the pool")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of the solved deals kept for testing")
+    parser.add_argument("--output", default="learned.json", help="JSON file the model is written to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mv_rules, sk_size = RULES[args.rules]
+    seeds = parse_seeds(args.seeds)
+    traces = collect_positions(seeds, args.solver, mv_rules, sk_size, args.time_limit, args.workers)
+    if len(traces) < 2:
+        sys.exit(f"only {len(traces)} of {len(seeds)} deals were solved, not enough to learn from")
+
+    # Whole deals are held out, positions of one solution look too much alike to test on each other
+    solved = sorted(traces)
+    cut = max(len(solved) - max(int(len(solved) * args.holdout), 1), 1)
+    train = [row for seed in solved[:cut] for row in traces[seed]]
+    test = [row for seed in solved[cut:] for row in traces[seed]]
+
+    model = fit(train)
+    cards_left = FEATURES.index("cards_left")
+    print(f"{len(traces)}/{len(seeds)} deals solved, {len(train)} positions to train on, {len(test)} to test on",
+          file=sys.stderr)
+    print(f"mean error on the test deals: {mean_error(model.estimate, test):.2f} moves "
+          f"(cards left alone: {mean_error(lambda row: row[cards_left], test):.2f})", file=sys.stderr)
+
+    # The model written is fitted again on every deal, the test deals were only kept apart to measure the error
+    fit(train + test).save(args.output)
+    print(f"model written to {args.output}", file=sys.stderr)
@@ -0,0 +1,243 @@
+"""
+Monte Carlo Tree Search player
+
+Instead of solving the deal up front, MCTS plays one move at a time: for move_budget seconds it grows a UCT tree
+from the current board, scoring leaves with short random playouts (biased towards foundation moves) on a copy of
+the board, then commits the most visited move and publishes it for get_move. The subtree under that move is kept
+as the next root, so the work done below it is not lost. The search runs in the BackgroundSolver thread, so the
+game keeps playing the published moves every frame while the tree is refined for the next one.
+
+Each new leaf gets a batch of playouts_per_leaf playouts, added to the tree in one backpropagation: selection and
+expansion replay moves on the full board while a playout only moves cards on a copy, so spreading them over several
+playouts puts more of the budget into playouts and gives each leaf a less noisy first value.
+
+A playout that wins is committed at once, moves of the tree and of the playout alike.
+"""
+import math
+import random
+import time
+from time import perf_counter
+
+from src.ai.algorithms import (BoardSolver, apply_move, count_duplicate, expand_node, get_possible_moves,
+                               get_state_key, is_win_state, translate_solution_to_index, undo_move)
+from src.ai.board import NUM_SLOTS
+
+
+class MCTSNode:
+    """
+    Node of the UCT tree, it keeps the move that leads to it and not the board, which is replayed from the root
+
+    Atributes:
+        untried: Legal moves not expanded yet, None until the node is first reached
+        visits: Playouts that went through the node
+        value: Sum of their rewards
+    """
+    __slots__ = ("move", "parent", "children", "untried", "visits", "value")
+
+    def __init__(self, move=None, parent=None):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.value = 0.0
+
+    def uct(self, exploration):
+        log_visits = math.log(self.parent.visits)
+        return self.value / self.visits + exploration * math.sqrt(log_visits / self.visits)
+
+
+class MCTS(BoardSolver):
+    """
+    UCT search committing one move per move_budget, see the module docstring
+
+    It gives up (is_lose) when every move from the board leads back to a position already played, after
+    max_moves moves or when time_limit runs out, after the moves committed so far have been played.
+    """
+    def __init__(self, gameplay_screen, move_budget=2.0, iterations=None, time_limit=None, max_moves=500,
+                 exploration=0.5, playout_depth=40, playouts_per_leaf=4, greedy=0.8, seed=None, exact_keys=False,
+                 progress=None):
+        """
+        :param move_budget: Seconds of search per committed move
+        :param iterations: Playouts per committed move, None for no limit
+        :param time_limit: Seconds before giving up on the whole game, None for no limit
+        :param max_moves: Moves committed before giving up
+        :param exploration: UCT exploration constant, rewards are between 0 and 1
+        :param playout_depth: Random moves per playout
+        :param playouts_per_leaf: Playouts run from each leaf reached
+        :param greedy: Chance that a playout takes a foundation move when there is one
+        :param seed: Seed of the playouts, None for a random one
+        """
+        super().__init__(gameplay_screen, exact_keys, progress=progress)
+        self.move_budget = move_budget
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.max_moves = max_moves
+        self.exploration = exploration
+        self.playout_depth = playout_depth
+        self.playouts_per_leaf = playouts_per_leaf
+        self.greedy = greedy
+        self.random = random.Random(seed)
+        self.played_keys = {get_state_key(self)}  # Positions already on the board, never gone back to
+        self.nodes_expanded = 0
+        self.playouts = 0
+
+        found = self.run(self.search)
+        if not found:
+            gameplay_screen.is_lose = True
+
+    def search(self):
+        start_time = time.time()
+        root = MCTSNode()
+        while not is_win_state(self):
+            if len(self.solution_path) >= self.max_moves:
+                return False
+            if self.time_limit is not None and time.time() - start_time > self.time_limit:
+                return False
+
+            line = self.think(root)
+            if line is not None:
+                self.commit(line)  # A playout won
+                return True
+            root = self.best_child(root)
+            if root is None:
+                return False
+            root.parent = None  # The subtree is kept, the rest of the tree goes
+            self.commit([root.move])
+        return True
+
+    def commit(self, line):
+        """
+        Plays moves on the board and publishes them
+        """
+        start = len(self.solution_path)
+        for move in line:
+            apply_move(self, move)
+            self.played_keys.add(get_state_key(self))
+        self.solution_path.extend(line)
+        translate_solution_to_index(self, start)
+
+    def best_child(self, root):
+        """
+        :return: The most visited child whose position wasn't played yet, None if there is none
+        """
+        best = None
+        for child in root.children:
+            if best is not None and child.visits <= best.visits:
+                continue
+            record = apply_move(self, child.move)
+            if get_state_key(self) not in self.played_keys:
+                best = child
+            undo_move(self, record)
+        return best
+
+    def think(self, root):
+        """
+        Runs UCT iterations from the board until the move budget is spent
+        :return: Moves to a win if a playout found one, else None
+        """
+        move_start = time.time()
+        iterations = 0
+        while self.iterations is None or iterations < self.iterations:
+            if iterations % 16 == 0 and time.time() - move_start > self.move_budget:
+                break
+            if root.untried is not None and not root.untried and not root.children:
+                break  # No move from the board
+            iterations += self.playouts_per_leaf
+            line = self.iterate(root)
+            if line is not None:
+                return line
+        return None
+
+    def iterate(self, root):
+        """
+        One selection, expansion, batch of playouts and backpropagation, the board is back at the root after it
+        :return: Moves to a win if the playout found one, else None
+        """
+        node = root
+        records = []
+        path_keys = set(self.played_keys)
+
+        # Selection, down the fully expanded nodes
+        while node.untried is not None and not node.untried and node.children:
+            node = max(node.children, key=lambda child: child.uct(self.exploration))
+            records.append(apply_move(self, node.move))
+            path_keys.add(get_state_key(self))
+
+        # Expansion of one untried move, moves back to a position on the path are dropped
+        if node.untried is None:
+            node.untried = get_possible_moves(self)
+            self.random.shuffle(node.untried)
+        while node.untried and not is_win_state(self):
+            move = node.untried.pop()
+            record = apply_move(self, move)
+            if get_state_key(self) in path_keys:
+                count_duplicate(self)
+                undo_move(self, record)
+                continue
+            node = MCTSNode(move, node)
+            node.parent.children.append(node)
+            records.append(record)
+            break
+        expand_node(self, len(self.solution_path) + len(records), len(node.children))
+        self.nodes_expanded += 1
+
+        total = 0.0
+        line = None
+        for _ in range(self.playouts_per_leaf):
+            reward, playout = self.playout()
+            total += reward
+            if reward == 1.0:
+                line = self.line_to(node) + playout
+                break
+
+        # Backpropagation
+        while node is not None:
+            node.visits += self.playouts_per_leaf
+            node.value += total
+            node = node.parent
+        for record in reversed(records):
+            undo_move(self, record)
+        return line
+
+    @staticmethod
+    def line_to(node):
+        """
+        :return: Moves from the root to the node
+        """
+        line = []
+        while node.parent is not None:
+            line.append(node.move)
+            node = node.parent
+        line.reverse()
+        return line
+
+    def playout(self):
+        """
+        Random moves on a copy of the board, taking a foundation move with probability greedy and never undoing
+        the previous move straight away
+        :return: (reward, the moves played). The reward is the share of cards on the foundations, 1.0 for a win
+        """
+        start = perf_counter() if self.stats is not None else None
+        board = self.board.copy()
+        moves = []
+        last = None
+        for _ in range(self.playout_depth):
+            if board.is_win():
+                break
+            legal = board.legal_moves()
+            if last is not None:
+                legal = [move for move in legal if not (move[1] == last[1] and move[2] == last[0])]
+            if not legal:
+                break
+            to_foundation = [move for move in legal if move[2] >= NUM_SLOTS]
+            if to_foundation and self.random.random() < self.greedy:
+                last = self.random.choice(to_foundation)
+            else:
+                last = self.random.choice(legal)
+            board.apply(last)
+            moves.append(last)
+        self.playouts += 1
+        if start is not None:
+            self.stats.timed("playout", start)
+        return board.foundation_count() / 52, moves
@@ -0,0 +1,192 @@
+"""
+Parallel depth first search over a multiprocessing pool
+
+The top of the tree is expanded breadth first until there are a few subtrees per worker, then each subtree is
+searched by a worker with the same iterative DFS as algorithms.DFS. Workers only get packed boards (Board.pack()), so
+nothing pygame related crosses the process boundary.
+
+Duplicate detection uses one table in shared memory: a lock-free array of 64 bit Zobrist hashes indexed by
+hash % size. A lost write only means a state may be searched twice, so no lock is needed. The first worker to find
+a solution ends the pool and the others are terminated.
+"""
+import os
+import time
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+from src.ai.board import Board
+from src.ai.pruning import MovePruner
+from src.ai.algorithms import BoardSolver, get_state_key, is_win_state, translate_solution_to_index
+
+# Set in each worker by _init_worker
+_shared_keys = None
+
+
+def _init_worker(shared_keys):
+    global _shared_keys
+    _shared_keys = shared_keys
+
+
+def _seen(state_key):
+    """
+    Checks a state against the shared table and marks it as seen
+    :return: True if another search (in this worker or another) already reached the state
+    """
+    i = state_key % len(_shared_keys)
+    if _shared_keys[i] == state_key:
+        return True
+    _shared_keys[i] = state_key
+    return False
+
+
+def _solve_subtree(task):
+    """
+    Worker side DFS of one subtree
+    :param task: (subtree index, packed board, mv_rules, sk_size, depth left, prune)
+    :return: (subtree index, moves from the subtree root or None, nodes expanded, the MovePruner or None)
+    """
+    index, snapshot, mv_rules, sk_size, max_depth, prune = task
+    board = Board.unpack(snapshot, mv_rules, sk_size)
+    pruner = MovePruner() if prune else None
+
+    def moves(last_move=None, last_record=None):
+        if pruner is None:
+            return board.legal_moves()
+        return pruner.moves(board, last_move, last_record)
+
+    path = []
+    path_keys = {board.hash}
+    stack = [(iter(moves()), None, None)]
+    nodes = 0
+    while stack:
+        move = next(stack[-1][0], None)
+
+        if move is None:
+            _, record, state_key = stack.pop()
+            if record is not None:
+                path_keys.discard(state_key)
+                board.undo(record)
+                path.pop()
+            continue
+
+        nodes += 1
+        record = board.apply(move)
+        state_key = board.hash
+        if state_key in path_keys or _seen(state_key):
+            board.undo(record)
+            continue
+
+        if len(stack) > max_depth:
+            board.undo(record)
+            continue
+
+        path.append(move)
+        if board.is_win():
+            return index, path, nodes, pruner
+
+        path_keys.add(state_key)
+        stack.append((iter(moves(move, record)), record, state_key))
+
+    return index, None, nodes, pruner
+
+
+class ParallelDFS(BoardSolver):
+    """
+    DFS split across processes, see the module docstring
+    """
+    def __init__(self, gameplay_screen, workers=None, max_depth=1000, time_limit=None, memory_limit=256,
+                 prune=True, subtrees_per_worker=4, progress=None):
+        """
+        :param workers: Number of processes, os.cpu_count() by default
+        :param max_depth: Depth limit of the whole search, like DFS
+        :param time_limit: Seconds before giving up, None for no limit
+        :param memory_limit: Memory cap in MB of the shared table (8 bytes per state)
+        :param prune: If True the workers' moves go through a MovePruner
+        :param subtrees_per_worker: How many subtrees to split per worker, more evens out the load
+        """
+        super().__init__(gameplay_screen, memory_limit=memory_limit, progress=progress)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.prune = prune
+        self.pruner = MovePruner() if prune else None  # The counters of every worker's pruner, added up
+        self.subtrees_per_worker = subtrees_per_worker
+        self.nodes_expanded = 0
+        self.subtrees = 0
+
+        found = self.run(self.search)
+        if not found:
+            self.solution_path = []
+            gameplay_screen.is_lose = True
+        translate_solution_to_index(self)
+
+    def split(self, count):
+        """
+        Expands the tree breadth first until the frontier has at least count boards
+        :return: List of (moves from the root, packed board), empty if the frontier died out. solution_path is set
+        instead if a winning board is found on the way
+        """
+        root = self.board
+        frontier = [([], root.pack())]
+        seen = {get_state_key(self)}
+        depth = 0
+        while len(frontier) < count and depth < self.max_depth:
+            next_frontier = []
+            for prefix, snapshot in frontier:
+                self.progress.update(depth)
+                self.board = Board.unpack(snapshot, self.board.mv_rules, self.board.sk_size)
+                for move in self.board.legal_moves():
+                    record = self.board.apply(move)
+                    state_key = get_state_key(self)
+                    if state_key not in seen:
+                        seen.add(state_key)
+                        if is_win_state(self):
+                            self.solution_path = prefix + [move]
+                            self.board = root
+                            return []
+                        next_frontier.append((prefix + [move], self.board.pack()))
+                    self.board.undo(record)
+            if not next_frontier:
+                frontier = []
+                break
+            frontier = next_frontier
+            depth += 1
+        self.board = root
+        return frontier
+
+    def search(self):
+        if is_win_state(self):
+            return True
+
+        start_time = time.time()
+        frontier = self.split(self.workers * self.subtrees_per_worker)
+        if self.solution_path:
+            return True
+        self.subtrees = len(frontier)
+        if not frontier:
+            return False
+
+        shared_keys = RawArray('Q', max(self.memory_limit * 1024 * 1024 // 8, 1))
+        tasks = [(i, snapshot, self.board.mv_rules, self.board.sk_size, self.max_depth - len(prefix), self.prune)
+                 for i, (prefix, snapshot) in enumerate(frontier)]
+        with multiprocessing.Pool(self.workers, _init_worker, (shared_keys,)) as pool:
+            results = pool.imap_unordered(_solve_subtree, tasks)
+            pending = len(tasks)
+            while pending:
+                # Wakes up regularly so a cancelled background search doesn't wait for the workers
+                try:
+                    index, path, nodes, pruner = results.next(0.1)
+                except multiprocessing.TimeoutError:
+                    self.progress.check()
+                    if self.time_limit is not None and time.time() - start_time > self.time_limit:
+                        return False
+                    continue
+                pending -= 1
+                self.nodes_expanded += nodes
+                self.progress.nodes += nodes
+                if pruner is not None:
+                    self.pruner.add(pruner)
+                if path is not None:
+                    self.solution_path = frontier[index][0] + path
+                    return True  # Leaving the with block terminates the other workers
+        return False
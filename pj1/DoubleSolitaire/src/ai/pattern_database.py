@@ -0,0 +1,238 @@
+"""
+Pattern database heuristic: exact costs of each suit on its own
+
+The board is projected onto one suit at a time, keeping only the next WINDOW cards that suit still has to send up:
+their order, bottom to top, within each slot. Everything else is left out, and so are the rules about where a card
+may go. In that abstract game a move takes a card of the suit with the cards of the suit above it onto any other
+slot (cost 1), and the next card goes up for free once it's the top card of the suit in its slot (auto moves cost
+nothing). Every real move is one of these moves or none at all, so the cheapest abstract solution never needs more
+moves than the real game: an admissible estimate of the moves left.
+
+build_table() works out the exact cost of every abstract position by a search backwards from the goal, layer by
+layer on the cards still to go, and stores them in one uint8 array indexed by state_index(). The array is saved
+with NumPy and memory mapped by PatternDatabase, so the table (2.2 MB for WINDOW = 7) is built once and shared by
+every process that searches.
+
+With sk_size 1 (Hard) a real move carries a single card, so it counts in one suit's cost at most and the costs of
+the four suits add up. Otherwise a stack can carry cards of several suits and only the largest cost is admissible.
+
+The solvers take pattern_estimate() as their heuristic: it looks up one PatternDatabase per process, created on the
+first call, so importing this module costs nothing and every search of the process shares the mapped table.
+"""
+import os
+
+try:
+    import numpy as np
+except ImportError:  # PatternDatabase needs it, see load_table and AVAILABLE
+    np = None
+
+from src.ai.board import EMPTY, NUM_RANKS, card_rank, card_suit
+
+WINDOW = 7  # Cards per suit in the pattern, WINDOW = 8 would take 45 MB
+UNKNOWN = 255
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "..", "..", f"pattern_database_{WINDOW}.npy")
+
+AVAILABLE = np is not None
+
+_shared = None  # The PatternDatabase of pattern_estimate, see shared_database
+
+
+def layer_offsets(window):
+    """
+    Start of each layer in the table, the layer of m cards takes (m + 1) ** m entries
+    :return: List of window + 2 offsets, the last one is the table size
+    """
+    offsets = [0]
+    for cards in range(window + 1):
+        offsets.append(offsets[-1] + (cards + 1) ** cards)
+    return offsets
+
+
+def state_index(lists, cards, offsets):
+    """
+    Position of an abstract state in the table
+    :param lists: The cards 0 to cards - 1 (0 is the next to go up) as lists per slot, bottom card first
+    :param cards: Number of cards in the state
+    :param offsets: layer_offsets() of the table
+    :return: Index, from the card each card lies on (cards for the bottom one) as a number in base cards + 1
+    """
+    index = 0
+    base = cards + 1
+    for column in lists:
+        below = cards
+        for card in column:
+            index += below * base ** card
+            below = card
+    return offsets[cards] + index
+
+
+def arrangements(cards):
+    """
+    Every abstract state of a layer: the cards shared out in lists, each state once
+    :return: List of sorted tuples of tuples
+    """
+    states = [()]
+    for card in range(cards):
+        grown = []
+        for lists in states:
+            grown.append(lists + ((card,),))
+            for i, column in enumerate(lists):
+                for height in range(len(column) + 1):
+                    grown.append(lists[:i] + (column[:height] + (card,) + column[height:],) + lists[i + 1:])
+        states = grown
+    return [tuple(sorted(lists)) for lists in states]
+
+
+def relocations(lists):
+    """
+    States one abstract move away: the cards from some height up in a list go on top of another list or alone
+    """
+    neighbours = []
+    for i, column in enumerate(lists):
+        others = lists[:i] + lists[i + 1:]
+        for height in range(len(column)):
+            moved, left = column[height:], column[:height]
+            rest = others + (left,) if left else others
+            if left:
+                neighbours.append(tuple(sorted(rest + (moved,))))
+            for j, target in enumerate(rest):
+                if target is left:
+                    continue  # Back where it was
+                neighbours.append(tuple(sorted(rest[:j] + (target + moved,) + rest[j + 1:])))
+    return neighbours
+
+
+def send_up(lists):
+    """
+    Sends card 0 to the foundation
+    :return: The state of the layer below (cards renumbered from 0), None if card 0 isn't the top of its list
+    """
+    if not any(column[-1] == 0 for column in lists):
+        return None
+    return tuple(sorted(tuple(card - 1 for card in column if card) for column in lists if column != (0,)))
+
+
+def build_table(window=WINDOW):
+    """
+    Exact abstract costs, each layer from the one below: a state starts at the cost of sending card 0 up, then the
+    relocations (cost 1) spread the lowest costs through the layer
+    :return: uint8 array of layer_offsets(window)[-1] entries, UNKNOWN where no state maps
+    """
+    offsets = layer_offsets(window)
+    table = np.full(offsets[-1], UNKNOWN, dtype=np.uint8)
+    table[offsets[0]] = 0
+    for cards in range(1, window + 1):
+        states = arrangements(cards)
+        cost = {}
+        buckets = {}
+        for lists in states:
+            below = send_up(lists)
+            if below is not None:
+                start = int(table[state_index(below, cards - 1, offsets)])
+                buckets.setdefault(start, []).append(lists)
+        level = 0
+        while len(cost) < len(states):
+            for lists in buckets.pop(level, []):
+                if lists in cost:
+                    continue
+                cost[lists] = level
+                for neighbour in relocations(lists):
+                    if neighbour not in cost:
+                        buckets.setdefault(level + 1, []).append(neighbour)
+            level += 1
+        for lists, value in cost.items():
+            table[state_index(lists, cards, offsets)] = value
+    return table
+
+
+def load_table(path=DEFAULT_PATH, window=WINDOW):
+    """
+    Memory maps a table saved by an earlier call, building and saving it first if there is none
+    :return: Read only uint8 array
+    """
+    if np is None:
+        raise RuntimeError("the pattern database needs NumPy (pip install numpy)")
+    if not os.path.exists(path):
+        temporary = f"{path}.{os.getpid()}.tmp.npy"  # Processes building at once don't see a half written file
+        np.save(temporary, build_table(window))
+        os.replace(temporary, path)
+    table = np.load(path, mmap_mode="r")
+    if table.shape != (layer_offsets(window)[-1],):
+        raise ValueError(f"{path} holds a table for another window, delete it to build it again")
+    return table.view(np.ndarray)  # Same mapped memory, without the slower indexing of np.memmap
+
+
+class PatternDatabase:
+    """
+    Admissible heuristic (board -> moves left) summing or maxing the suit costs, see the module docstring. The
+    table is only opened on the first call, so instances can be handed to worker processes
+    """
+    def __init__(self, path=DEFAULT_PATH, window=WINDOW):
+        self.path = path
+        self.window = window
+        self.offsets = layer_offsets(window)
+        # powers[size][card], weight of a card's entry in state_index for a layer of size cards
+        self.powers = [[(size + 1) ** card for card in range(size)] for size in range(window + 1)]
+        self.table = None
+
+    def __getstate__(self):
+        return dict(self.__dict__, table=None)  # Each process maps the file itself
+
+    def lookup(self, board):
+        """
+        Projects the board on every suit in one pass over the cards
+        :return: (list of the abstract cost of each suit, BoardHeuristics.blocked_slots)
+        """
+        if self.table is None:
+            self.table = load_table(self.path, self.window)
+        placed = [0] * 4
+        for top in board.foundations:
+            if top != EMPTY:
+                placed[card_suit(top)] = card_rank(top) + 1
+        sizes = [min(self.window, NUM_RANKS - first) for first in placed]
+        powers = [self.powers[size] for size in sizes]
+
+        indexes = [0] * 4
+        blocked_slots = 0
+        for cards in board.slots:
+            below = list(sizes)  # Per suit, the pattern card under the next one found in this slot
+            lowest = [NUM_RANKS] * 4
+            blocked = False
+            for code in cards:
+                suit, rank = divmod(code, NUM_RANKS)
+                if rank > lowest[suit]:
+                    blocked = True
+                else:
+                    lowest[suit] = rank
+                card = rank - placed[suit]
+                if 0 <= card < sizes[suit]:
+                    indexes[suit] += below[suit] * powers[suit][card]
+                    below[suit] = card
+            blocked_slots += blocked
+        table, offsets = self.table, self.offsets
+        costs = [int(table[offsets[size] + index]) for size, index in zip(sizes, indexes)]
+        return costs, blocked_slots
+
+    def __call__(self, board):
+        if board.is_win():
+            return 0
+        costs, blocked_slots = self.lookup(board)
+        estimate = sum(costs) if board.sk_size == 1 else max(costs)
+        return max(estimate, blocked_slots, 1)  # Never below BoardHeuristics.lower_bound
+
+
+def shared_database():
+    """
+    :return: The PatternDatabase of DEFAULT_PATH, created on the first call and shared by the searches of the process
+    """
+    global _shared
+    if _shared is None:
+        _shared = PatternDatabase()
+    return _shared
+
+
+def pattern_estimate(board):
+    """
+    Admissible heuristic board -> moves left of the shared PatternDatabase, for AStar and IDAStar
+    """
+    return shared_database()(board)
@@ -0,0 +1,90 @@
+"""
+Memory measurement of a search, at three levels
+
+    "off": nothing is measured, the search runs at full speed (the game's default)
+    "rss": a side thread samples the resident memory of the process, cheap enough for batch runs
+    "tracemalloc": every allocation is traced, exact but the search runs several times slower
+
+Both measuring levels report the peak in KB above what was in use when the search started.
+"""
+import os
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not on Windows
+    resource = None
+
+PROFILE_LEVELS = ("off", "rss", "tracemalloc")
+
+_STATM = "/proc/self/statm"
+
+
+def current_rss_kb():
+    """
+    :return: Resident memory of this process in KB, the peak so far where /proc is missing, None if neither works
+    """
+    try:
+        with open(_STATM) as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None
+
+
+class MemoryProbe:
+    """
+    Measures the peak memory between start() and stop()
+    """
+    def __init__(self, level="off", interval=0.005):
+        """
+        :param level: One of PROFILE_LEVELS
+        :param interval: Seconds between RSS samples
+        """
+        if level not in PROFILE_LEVELS:
+            raise ValueError(f'Unknown profiling level {level}.')
+        self.level = level
+        self.interval = interval
+        self.owns_tracing = False
+        self.base = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.level == "tracemalloc":
+            # A benchmark may already be tracing, then it is the one to stop it
+            self.owns_tracing = not tracemalloc.is_tracing()
+            if self.owns_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.base = tracemalloc.get_traced_memory()[0]
+        elif self.level == "rss":
+            self.base = current_rss_kb()
+            self.peak = self.base
+            if self.base is not None:
+                self._thread = threading.Thread(target=self._sample, daemon=True)
+                self._thread.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_kb())
+
+    def stop(self):
+        """
+        :return: Peak in KB above the memory in use at start(), None with level "off"
+        """
+        if self.level == "tracemalloc":
+            peak = tracemalloc.get_traced_memory()[1]
+            if self.owns_tracing:
+                tracemalloc.stop()
+            return (peak - self.base) / 1024
+        if self.level == "rss" and self.base is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_rss_kb())
+            return self.peak - self.base
+        return None
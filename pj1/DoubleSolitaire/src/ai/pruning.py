@@ -0,0 +1,129 @@
+"""
+Move pruning for the in-place solvers (DFS, IDA*)
+
+Cuts children that can't lead anywhere new, before they are applied:
+    - Safe foundation moves (the check_auto_moves rule) are forced as the only child
+    - A slot -> slot move right after its exact inverse is skipped
+    - Two independent slot -> slot moves are only tried in one order (the smaller move first)
+    - Slot -> slot moves that leave a lost board (deadlock.creates_deadlock) are skipped
+
+The second and third rules only hold when the previous move set off no auto moves, since auto moves can change which
+tops are free. The Board plays safe moves on its own after each move, so the first rule mostly catches boards that
+weren't settled. The deadlock test costs several node expansions and only pays off when stacks can't move (Hard),
+so it switches itself off when its first DEADLOCK_TRIAL tests cut nothing.
+"""
+from src.ai.board import NUM_SLOTS, card_rank
+from src.ai.deadlock import creates_deadlock
+
+DEADLOCK_TRIAL = 2000
+
+
+class MovePruner:
+    """
+    Filters Board.legal_moves() and counts how much each rule cut
+
+    Atributes:
+        nodes: Positions whose moves were generated
+        generated: Legal moves before pruning
+        kept: Moves left after pruning
+        forced, reversals, commuted, lost: Nodes / moves cut by each rule
+    """
+    def __init__(self, deadlocks=True):
+        """
+        :param deadlocks: If True slot -> slot moves that leave a lost board are cut, while the test pays off
+        """
+        self.deadlocks = deadlocks
+        self.deadlock_tests = 0
+        self.nodes = 0
+        self.generated = 0
+        self.kept = 0
+        self.forced = 0
+        self.reversals = 0
+        self.commuted = 0
+        self.lost = 0
+
+    def moves(self, board, last_move=None, last_record=None):
+        """
+        Legal moves of the board minus the pruned ones
+        :param board: The Board
+        :param last_move: Move that led to this position, None at the root
+        :param last_record: Its undo record from Board.apply
+        :return: List of (source, code, target)
+        """
+        moves = board.legal_moves()
+        self.nodes += 1
+        self.generated += len(moves)
+
+        wanted = board.auto_rank()
+        for move in moves:
+            if move[2] >= NUM_SLOTS and card_rank(move[1]) == wanted:
+                self.forced += 1
+                self.kept += 1
+                return [move]
+
+        if last_move is None or last_move[2] >= NUM_SLOTS or last_record[4]:
+            return self._cut_deadlocks(board, moves)
+
+        last_source, last_code, last_target = last_move
+        kept = []
+        for move in moves:
+            source, code, target = move
+            if target < NUM_SLOTS:
+                if code == last_code and source == last_target and target == last_source:
+                    self.reversals += 1
+                    continue
+                if (move < last_move and source not in (last_source, last_target)
+                        and target not in (last_source, last_target) and not self._exposes_auto(board, move, wanted)):
+                    self.commuted += 1  # Same position as playing this move first, which is tried before
+                    continue
+            kept.append(move)
+        return self._cut_deadlocks(board, kept)
+
+    def _cut_deadlocks(self, board, moves):
+        if self.deadlocks:
+            kept = [move for move in moves if not creates_deadlock(board, move)]
+            self.deadlock_tests += len(moves)
+            self.lost += len(moves) - len(kept)
+            if not self.lost and self.deadlock_tests >= DEADLOCK_TRIAL:
+                self.deadlocks = False
+            moves = kept
+        self.kept += len(moves)
+        return moves
+
+    @staticmethod
+    def _exposes_auto(board, move, wanted):
+        """
+        True if the card left on top of the source slot would be sent to a foundation, the only way a slot -> slot
+        move from a settled board sets off auto moves
+        """
+        cards = board.slots[move[0]]
+        start = cards.index(move[1])
+        return start > 0 and card_rank(cards[start - 1]) == wanted
+
+    def add(self, other):
+        """
+        Adds the counters of another pruner, the one of a worker process for instance
+        """
+        self.deadlock_tests += other.deadlock_tests
+        self.nodes += other.nodes
+        self.generated += other.generated
+        self.kept += other.kept
+        self.forced += other.forced
+        self.reversals += other.reversals
+        self.commuted += other.commuted
+        self.lost += other.lost
+
+    def stats(self):
+        """
+        :return: Dict with the counters and the branching factor before and after pruning
+        """
+        nodes = max(self.nodes, 1)
+        return {
+            "nodes": self.nodes,
+            "branching_before": self.generated / nodes,
+            "branching_after": self.kept / nodes,
+            "forced": self.forced,
+            "reversals": self.reversals,
+            "commuted": self.commuted,
+            "lost": self.lost,
+        }
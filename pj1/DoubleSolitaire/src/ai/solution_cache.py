@@ -0,0 +1,80 @@
+"""
+On-disk cache of solved deals
+
+Solutions are stored in a SQLite file keyed by the deal's Board.fingerprint() (after the opening auto moves) and
+the AI mode, so a restarted deal or a reloaded save starts playing at once. Moves are kept in canonical form
+(Board.to_canonical) since the same position can come with its slots and foundations in another order. The cache
+holds at most max_entries solutions and drops the least recently used ones past that.
+"""
+import json
+import sqlite3
+import time
+from contextlib import closing
+
+from src.ai.algorithms import BoardSolver, translate_solution_to_index
+
+
+class SolutionCache:
+    """
+    Least recently used store of canonical solutions
+
+    A connection is opened per call, so the cache can be used from the background solver thread as well.
+    """
+    def __init__(self, path="solutions.db", max_entries=500):
+        """
+        :param path: The SQLite file, created if missing
+        :param max_entries: Most solutions kept
+        """
+        self.path = path
+        self.max_entries = max_entries
+        with closing(self._connect()) as db, db:
+            db.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                       "fingerprint TEXT, mode TEXT, moves TEXT, last_used REAL, PRIMARY KEY (fingerprint, mode))")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, fingerprint, mode):
+        """
+        Looks up a solution and marks it as used
+        :param fingerprint: Board.fingerprint() of the position the solution starts from
+        :param mode: The AI mode that found it
+        :return: List of canonical moves, None if the position isn't cached
+        """
+        with closing(self._connect()) as db, db:
+            row = db.execute("SELECT moves FROM solutions WHERE fingerprint = ? AND mode = ?",
+                             (fingerprint, mode)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE solutions SET last_used = ? WHERE fingerprint = ? AND mode = ?",
+                       (time.time(), fingerprint, mode))
+        return [tuple(move) for move in json.loads(row[0])]
+
+    def put(self, fingerprint, mode, moves):
+        """
+        Stores a solution, evicting the least recently used ones past max_entries
+        :param moves: List of canonical moves
+        """
+        with closing(self._connect()) as db, db:
+            db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                       (fingerprint, mode, json.dumps(moves), time.time()))
+            db.execute("DELETE FROM solutions WHERE rowid IN "
+                       "(SELECT rowid FROM solutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                       (self.max_entries,))
+
+    def __len__(self):
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+
+class CachedSolver(BoardSolver):
+    """
+    "Solver" that plays a cached solution, so it goes through the same handle as a real search
+    """
+    def __init__(self, gameplay_screen, moves, progress=None):
+        """
+        :param moves: Canonical moves from SolutionCache.get
+        """
+        super().__init__(gameplay_screen, progress=progress)
+        self.solution_path = self.board.from_canonical(moves)
+        translate_solution_to_index(self)
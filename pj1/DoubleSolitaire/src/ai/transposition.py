@@ -0,0 +1,170 @@
+"""
+Bounded transposition table for the solvers' visited states
+
+The table holds at most a number of entries worked out from a memory cap, so a long search keeps a steady footprint
+instead of growing a set or dict until the machine swaps. Until the cap is reached it is a plain dict that grows with
+the search and forgets nothing. When it fills up the entries move to fixed size bucket arrays, where a replacement
+policy decides which state is kept when two land on the same bucket; losing an entry only means that state may be
+searched again.
+"""
+
+# Rough cost of one entry while the table is a dict: key int, (value, depth) tuple and the dict slot. The bucket
+# arrays take about half as much, so the move to them never passes the cap
+ENTRY_BYTES = 150
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table keyed by state keys (Zobrist hashes)
+
+    Policies:
+        "depth": one entry per bucket, the state closer to the root wins since it has the larger subtree behind it
+        "two_tier": two entries per bucket, one kept by the depth rule and one that always takes the newest state
+
+    Atributes:
+        hits, misses: Lookups that found / didn't find the key
+        stores: New keys written
+        evictions: Keys lost, either overwritten or not stored because the bucket kept the other state
+    """
+    def __init__(self, memory_limit=256, policy="two_tier"):
+        """
+        :param memory_limit: Memory cap in MB
+        :param policy: "depth" or "two_tier"
+        """
+        if policy not in ("depth", "two_tier"):
+            raise ValueError(f'Unknown replacement policy {policy}.')
+        self.policy = policy
+        self.ways = 2 if policy == "two_tier" else 1
+        self.buckets = max(int(memory_limit * 1024 * 1024 / ENTRY_BYTES) // self.ways, 1)
+        self.capacity = self.buckets * self.ways
+        self.entries = {}  # key -> (value, depth) until the table is full, then None
+        self.keys = self.values = self.depths = None  # The bucket arrays, once the table is full
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _find(self, key):
+        first = (hash(key) % self.buckets) * self.ways
+        for i in range(first, first + self.ways):
+            if self.keys[i] == key:
+                return i, first
+        return None, first
+
+    def get(self, key, default=None):
+        """
+        Looks up a state
+        :param key: The state key
+        :return: The stored value, default if the state isn't in the table
+        """
+        if self.entries is not None:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[0]
+        i, _ = self._find(key)
+        if i is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return self.values[i]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def store(self, key, value=True, depth=0):
+        """
+        Writes a state, following the replacement policy if its bucket is full
+        :param key: The state key
+        :param value: Anything but None (cost for UCS/A*, True for plain visited sets)
+        :param depth: Distance from the root, shallower states are preferred
+        """
+        entries = self.entries
+        if entries is not None:
+            entry = entries.get(key)
+            if entry is not None:
+                entries[key] = (value, min(depth, entry[1]))
+                return
+            if self.size < self.capacity:
+                self.stores += 1
+                entries[key] = (value, depth)
+                self.size += 1
+                return
+            self._fill_buckets()
+
+        i, first = self._find(key)
+        if i is not None:
+            self.values[i] = value
+            self.depths[i] = min(depth, self.depths[i])
+            return
+
+        self.stores += 1
+        keys, depths = self.keys, self.depths
+        if keys[first] is None or depth <= depths[first]:
+            if self.ways == 2 and keys[first] is not None:
+                # The old depth preferred entry moves down to the always replace slot
+                self._write(first + 1, keys[first], self.values[first], depths[first])
+                keys[first] = None
+                self.size -= 1
+            self._write(first, key, value, depth)
+        elif self.ways == 2:
+            self._write(first + 1, key, value, depth)
+        else:
+            self.evictions += 1  # The bucket keeps the shallower state
+
+    def add(self, key, depth=0):
+        self.store(key, True, depth)
+
+    def _fill_buckets(self):
+        """
+        Moves the entries of the full dict to the bucket arrays, the replacement policy drops the ones that don't fit
+        """
+        entries = self.entries
+        self.entries = None
+        self.keys = [None] * self.capacity
+        self.values = [None] * self.capacity
+        self.depths = [0] * self.capacity
+        self.size = 0
+        stores = self.stores
+        while entries:
+            key, (value, depth) = entries.popitem()  # Frees the dict's tuples while the arrays fill
+            self.store(key, value, depth)
+        self.stores = stores
+
+    def clear(self):
+        """
+        Empties the table for a new search, the counters keep adding up
+        """
+        self.entries = {}
+        self.keys = self.values = self.depths = None
+        self.size = 0
+
+    def _write(self, i, key, value, depth):
+        if self.keys[i] is None:
+            self.size += 1
+        else:
+            self.evictions += 1
+        self.keys[i] = key
+        self.values[i] = value
+        self.depths[i] = depth
+
+    def __len__(self):
+        return self.size
+
+    def stats(self):
+        """
+        :return: Dict with the table's counters
+        """
+        return {
+            "policy": self.policy,
+            "capacity": self.capacity,
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,136 @@
+"""
+BoardHeuristics.weighted_combination for many positions at once, with NumPy
+
+Positions are encoded as an (N, NUM_SLOTS, max_len) array of card codes, bottom card first and padded with EMPTY
+above the top card of each slot, plus an (N, NUM_FOUNDATIONS) array of foundation tops. Each of the five terms is a
+few array operations over the whole batch instead of a Python loop over the cards of every board, so a batch of a
+few hundred positions costs about a third of the Python terms. Each call also costs a fixed ~0.5 ms, so it only
+pays off on large batches: BeamSearch(batch_heuristic=move_costs) scores a whole layer in one call, while the ten
+or so children of a single UniformCostSearch node are still faster one at a time.
+
+NumPy is optional: without it AVAILABLE is False and move_costs scores the boards one at a time with BoardHeuristics.
+"""
+try:
+    import numpy as np
+except ImportError:  # Not installed, see AVAILABLE
+    np = None
+
+from src.ai.board import EMPTY, NUM_FOUNDATIONS, NUM_RANKS, NUM_SLOTS, SEPARATOR, Board
+from src.ai.heuristics import BoardHeuristics
+
+AVAILABLE = np is not None
+
+
+def encode(positions):
+    """
+    :param positions: List of (slots, foundations), slots as lists (or bytes) of card codes
+    :return: (slots array (N, NUM_SLOTS, max_len), foundations array (N, NUM_FOUNDATIONS))
+    """
+    # At least two cards high, so every slot has a (maybe empty) pair for blocked_cards and sequential_progress
+    max_len = max((len(cards) for slots, _ in positions for cards in slots), default=0)
+    slots = np.full((len(positions), NUM_SLOTS, max(max_len, 2)), EMPTY, dtype=np.int16)
+    foundations = np.empty((len(positions), NUM_FOUNDATIONS), dtype=np.int16)
+    for n, (cards_by_slot, tops) in enumerate(positions):
+        for i, cards in enumerate(cards_by_slot):
+            slots[n, i, :len(cards)] = list(cards)
+        foundations[n] = tops
+    return slots, foundations
+
+
+def encode_boards(boards):
+    return encode([(board.slots, board.foundations) for board in boards])
+
+
+def encode_packed(snapshots):
+    """
+    Same as encode for Board.pack() snapshots, read all at once from their bytes without rebuilding the boards
+    """
+    data = np.frombuffer(b"".join(snapshots), dtype=np.uint8)
+    snapshot = np.repeat(np.arange(len(snapshots)), [len(packed) for packed in snapshots])
+    separators = data == SEPARATOR
+    # Slot of every byte, a separator ends its slot and NUM_SLOTS stands for the foundation tops
+    slot = np.cumsum(separators) - separators - snapshot * NUM_SLOTS
+    # Every (snapshot, slot) group has at least its separator, so the groups follow each other in order
+    group = snapshot * (NUM_SLOTS + 1) + slot
+    starts = np.flatnonzero(np.diff(group, prepend=-1))
+    height = np.arange(len(data)) - starts[group]
+
+    cards = ~separators & (slot < NUM_SLOTS)
+    max_len = int(height[cards].max()) + 1 if cards.any() else 0
+    slots = np.full((len(snapshots), NUM_SLOTS, max(max_len, 2)), EMPTY, dtype=np.int16)
+    slots[snapshot[cards], slot[cards], height[cards]] = data[cards]
+    foundations = data[slot == NUM_SLOTS].reshape(len(snapshots), NUM_FOUNDATIONS).astype(np.int16) - 1
+    return slots, foundations
+
+
+def top_cards(slots):
+    """
+    :return: (N, NUM_SLOTS) array of the top card of each slot, EMPTY for empty slots
+    """
+    heights = (slots != EMPTY).sum(axis=2)
+    tops = np.take_along_axis(slots, np.maximum(heights - 1, 0)[..., None], axis=2)[..., 0]
+    return np.where(heights > 0, tops, EMPTY)
+
+
+def cards_in_foundation(foundations):
+    return np.where(foundations == EMPTY, 0, foundations % NUM_RANKS + 1).sum(axis=1)
+
+
+def available_moves(tops, foundations):
+    present = tops != EMPTY
+    ranks = np.where(present, tops % NUM_RANKS, NUM_RANKS)
+    # Slots per top rank, the extra column stands for the rank above King (and empty slots) and stays 0
+    counts = np.zeros((len(tops), NUM_RANKS + 2), dtype=np.int16)
+    counts[:, :NUM_RANKS] = (ranks[:, :, None] == np.arange(NUM_RANKS)).sum(axis=1)
+    to_slots = np.take_along_axis(counts, ranks + 1, axis=1)
+
+    aces = ranks == 0
+    any_empty = (foundations == EMPTY).any(axis=1)[:, None]
+    on_previous = (foundations[:, None, :] == (tops - 1)[:, :, None]).any(axis=2)
+    to_foundation = present & np.where(aces, any_empty, on_previous)
+    return (to_slots + to_foundation).sum(axis=1)
+
+
+def distance_to_foundation(tops, foundations):
+    distances = tops[:, :, None] % NUM_RANKS - foundations[:, None, :] % NUM_RANKS
+    valid = (tops != EMPTY)[:, :, None] & (foundations != EMPTY)[:, None, :] & (distances >= 0)
+    return NUM_RANKS - np.where(valid, distances, NUM_RANKS).min(axis=(1, 2))
+
+
+def blocked_cards(slots):
+    lower, upper = slots[:, :, :-1], slots[:, :, 1:]
+    on_rank = lower % NUM_RANKS == upper % NUM_RANKS + 1
+    other_suit = lower // NUM_RANKS != upper // NUM_RANKS
+    return ((upper != EMPTY) & ~(on_rank & other_suit)).sum(axis=(1, 2))
+
+
+def sequential_progress(slots):
+    lower, upper = slots[:, :, :-1], slots[:, :, 1:]
+    descending = ((upper == EMPTY) | (lower % NUM_RANKS == upper % NUM_RANKS + 1)).all(axis=2)
+    return (descending & (upper[:, :, 0] != EMPTY)).sum(axis=1)
+
+
+def weighted_combination(slots, foundations):
+    """
+    BoardHeuristics.weighted_combination of every encoded position
+    :return: (N,) float array
+    """
+    tops = top_cards(slots)
+    return (cards_in_foundation(foundations) * 1.5
+            + available_moves(tops, foundations) * 1.0
+            + distance_to_foundation(tops, foundations) * 1.0
+            + blocked_cards(slots) * 1.0
+            + sequential_progress(slots) * 1.5)
+
+
+def move_costs(snapshots):
+    """
+    UniformCostSearch.move_cost of each snapshot, lower is better (so it also fits BeamSearch's batch_heuristic)
+    :param snapshots: List of Board.pack() snapshots
+    :return: List of floats
+    """
+    if not snapshots:
+        return []
+    if not AVAILABLE:
+        return [1000 - BoardHeuristics.weighted_combination(Board.unpack(packed)) for packed in snapshots]
+    return (1000 - weighted_combination(*encode_packed(snapshots))).tolist()
@@ -25,6 +25,17 @@ class ConfigManager:
         self.gameNoAnims = self.config.getboolean('info', 'no anims')
         self.gameFullscreen = self.config.getboolean('info', 'Fullscreen')
         self.gameGlints = self.config.getboolean('info', 'Glints')
+        self.gameAiTimeLimit = self.config.getint('info', 'ai time limit', fallback=30)
+        self.gameAstarWeight = self.config.getfloat('info', 'astar weight', fallback=2.0)
+        self.gameAiMemoryLimit = self.config.getint('info', 'ai memory limit', fallback=256)
+        self.gameAiWorkers = self.config.getint('info', 'ai workers', fallback=1)
+        self.gameAiMoveBudget = self.config.getfloat('info', 'ai move budget', fallback=2.0)
+        self.gameAiNodeBudget = self.config.getint('info', 'ai node budget', fallback=0)
+        self.gameAiCacheFile = self.config.get('info', 'ai cache file', fallback='solutions.db')
+        self.gameAiCacheSize = self.config.getint('info', 'ai cache size', fallback=500)
+        self.gameAiBeamWidth = self.config.getint('info', 'ai beam width', fallback=64)
+        self.gameAiProfile = self.config.get('info', 'ai profile', fallback='off')
+        self.gameAiPatternDatabase = self.config.getboolean('info', 'ai pattern database', fallback=True)
 
     def update_config(self, option, value):
         """
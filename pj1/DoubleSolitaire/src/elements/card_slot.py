@@ -7,7 +7,8 @@ class CardSlot:
     """
     Represents a card slot in the game
 
-    Manages position and rendering
+    Manages position and rendering. Card positions are laid out lazily: changes only mark the slot dirty and
+    draw_cards() lays it out once before drawing, so several changes between two frames cost a single layout.
     """
     def __init__(self, position, vertical_offset=25, is_foundation=False, bg_sprite=None, mv_rules=0, sk_size=0):
         """
@@ -24,6 +25,7 @@ class CardSlot:
         self.background = bg_sprite
         self.mv_rules = mv_rules
         self.sk_size = 100 if sk_size == 0 else sk_size
+        self.dirty = False        # True when the cards moved since the last layout
 
     def __lt__(self, other):
         return len(self.cards) < len(other.cards) 
@@ -35,7 +37,7 @@ class CardSlot:
 
         self.cards = kings + non_kings
 
-        self.reposition_cards()
+        self.dirty = True
 
     def update(self):
         """
@@ -46,7 +48,7 @@ class CardSlot:
 
     def add_card(self, card, to_animate=False):
         """
-        Adds a card to the cardSlot object and recalculates positions
+        Adds a card to the cardSlot object, its position is worked out at the next draw
 
         If an animation is to be played then, to_animate is set to True, since the repositioning
         should only be made after the animation is played.
@@ -56,6 +58,13 @@ class CardSlot:
         """
         self.cards.append(card)
         if not to_animate:
+            self.dirty = True
+
+    def layout(self):
+        """
+        Repositions the cards if they changed since the last layout
+        """
+        if self.dirty:
             self.reposition_cards()
 
     def reposition_cards(self):
@@ -78,6 +87,7 @@ class CardSlot:
                     new_offset = -1 * 4
                     new_offset += int(-0.5 * (scale_factor - 4))
             card.rect.topleft = (x, y + i * (self.vertical_offset + new_offset))
+        self.dirty = False
 
     def remove_card(self):
         """
@@ -107,6 +117,7 @@ class CardSlot:
         """
         Draw  the slot's cards.
         """
+        self.layout()
         for card in self.cards:
             surface.blit(card.image, card.rect.topleft)
 
@@ -219,19 +230,30 @@ class CardSlot:
         if moving_stack is None:
             return False
 
-        for moving_card in moving_stack:
-            from_slot.cards.remove(moving_card)
-            self.add_card(moving_card, to_animate=to_animate)
+        self._take_stack(from_slot, len(moving_stack), to_animate)
         return True
 
     def undo_drop_card(self, card, from_slot):
 
         moving_stack = from_slot.get_stack_from_card(card, max_stack=len(from_slot.cards))
-        for moving_card in moving_stack:
-            from_slot.cards.remove(moving_card)
-            self.add_card(moving_card, to_animate=False)
+        self._take_stack(from_slot, len(moving_stack), to_animate=False)
         return True
 
+    def _take_stack(self, from_slot, count, to_animate):
+        """
+        Moves the top count cards of another slot onto this one in a single slice
+
+        The cards left behind are spaced by the slot length, so the source slot is marked dirty as well.
+        """
+        if count == 0:
+            return
+        start = len(from_slot.cards) - count
+        self.cards.extend(from_slot.cards[start:])
+        del from_slot.cards[start:]
+        from_slot.dirty = True
+        if not to_animate:
+            self.dirty = True
+
 
     def __str__(self):
         return ", ".join(str(card) for card in self.cards)
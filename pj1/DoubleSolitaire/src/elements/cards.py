@@ -112,13 +112,17 @@ class Cards:
                 card = Card(suit,rank,card_image)
                 self.cards.append(card)
 
-    def shuffle(self):
+    def shuffle(self, seed=None):
         """
         Shuffles the cards randomly
+        :param seed: Seed for a repeatable shuffle (the same deal as Board.deal(seed)), None for a random one
         :return:
         """
         self.all_cards = self.cards[:]
-        random.shuffle(self.cards)
+        if seed is None:
+            random.shuffle(self.cards)
+        else:
+            random.Random(seed).shuffle(self.cards)
 
     def is_in_deck(self, card):
         if card in self.cards:
@@ -52,6 +52,12 @@ def ai_update(self):
     if self.ai is None:
         return
 
+    if self.ai.poll():
+        self.sidebar.set_ai_status("")
+    else:
+        progress = self.ai.progress
+        self.sidebar.set_ai_status(f"{progress.nodes // 1000}k d{progress.depth}")
+
     orig_slot, card, target_slot = self.ai.get_move()
 
     if orig_slot == 0 and card == 0 and target_slot == 0:
@@ -1,12 +1,22 @@
+import sqlite3
+
 import pygame
 
 from src.config import config_manager
-from src.ai.template import TemplateAi
 from src.submenu.game_sidebar import Sidebar
 from src.submenu.options_menu import OptionsMenu
-from src.ai.heuristics import Heuristics
+from src.ai.heuristics import Heuristics, BoardHeuristics
 from src.ai.algorithms import UniformCostSearch
-from src.ai.algorithms import DFS
+from src.ai.algorithms import DFS, BFS
+from src.ai.algorithms import AStar, IDAStar
+from src.ai.algorithms import AnytimeSearch, BeamSearch
+from src.ai.parallel import ParallelDFS
+from src.ai.mcts import MCTS
+from src.ai.background import BackgroundSolver
+from src.ai.board import NUM_SLOTS, Board, card_suit, is_red
+from src.ai.deadlock import find_deadlock
+from src.ai import pattern_database
+from src.ai.solution_cache import SolutionCache, CachedSolver
 
 
 from src.gameplay.gameplay_events import (
@@ -169,17 +179,106 @@ class GameplayScreen:
         return 2000
 
     def _create_ai(self):
+        """
+        Starts the solver of the chosen player type in a background thread
+        :return: The BackgroundSolver handle, None for a human player
+        """
+        if self.slots is None:
+            return None  # The game file didn't load, update() goes back to the menu
+        memory_limit = config_manager.gameAiMemoryLimit
         match self.ai_player:
             case 1:
-                ai = TemplateAi()
+                solver, kwargs = BFS, dict(time_limit=config_manager.gameAiTimeLimit, memory_limit=memory_limit)
             case 2:
-                ai = DFS(self)
+                if config_manager.gameAiWorkers > 1:
+                    solver, kwargs = ParallelDFS, dict(workers=config_manager.gameAiWorkers,
+                                                       time_limit=config_manager.gameAiTimeLimit,
+                                                       memory_limit=memory_limit)
+                else:
+                    solver, kwargs = DFS, dict(memory_limit=memory_limit)
             case 3:
-                ai = UniformCostSearch(self)
+                solver, kwargs = UniformCostSearch, dict(memory_limit=memory_limit)
+            case 4:
+                solver, kwargs = AStar, dict(heuristic=self._optimal_heuristic(),
+                                             time_limit=config_manager.gameAiTimeLimit, memory_limit=memory_limit)
+            case 5:
+                solver, kwargs = IDAStar, dict(heuristic=self._optimal_heuristic(),
+                                               time_limit=config_manager.gameAiTimeLimit)
+            case 6:
+                solver, kwargs = AStar, dict(weight=config_manager.gameAstarWeight,
+                                             heuristic=BoardHeuristics.cards_left,
+                                             time_limit=config_manager.gameAiTimeLimit, memory_limit=memory_limit)
+            case 7:
+                solver, kwargs = AnytimeSearch, dict(move_budget=config_manager.gameAiMoveBudget,
+                                                     node_budget=config_manager.gameAiNodeBudget or None,
+                                                     time_limit=self.time_limit, weight=config_manager.gameAstarWeight,
+                                                     memory_limit=memory_limit)
+            case 8:
+                solver, kwargs = BeamSearch, dict(beam_width=config_manager.gameAiBeamWidth,
+                                                  time_limit=config_manager.gameAiTimeLimit, memory_limit=memory_limit)
+            case 9:
+                solver, kwargs = MCTS, dict(move_budget=config_manager.gameAiMoveBudget,
+                                            iterations=config_manager.gameAiNodeBudget or None,
+                                            time_limit=self.time_limit)
             case _:
                 self.ai_player = 0
-                ai = None
-        return ai
+                return None
+        return self._start_ai(solver, kwargs)
+
+    @staticmethod
+    def _optimal_heuristic():
+        """
+        :return: The pattern database estimate for A* and IDA* if it is turned on and NumPy is installed, None for
+        their default (BoardHeuristics.lower_bound)
+        """
+        if config_manager.gameAiPatternDatabase and pattern_database.AVAILABLE:
+            return pattern_database.pattern_estimate
+        return None
+
+    def _start_ai(self, solver, kwargs):
+        """
+        Plays the cached solution of this deal if there is one, otherwise starts the search and caches what it finds.
+        A deal that is lost from the start (see deadlock) is called lost straight away
+        :param solver: The BoardSolver subclass
+        :param kwargs: Its parameters
+        :return: The BackgroundSolver handle, None for a lost deal
+        """
+        kwargs = dict(kwargs, profile=config_manager.gameAiProfile)  # Taken by BackgroundSolver, not the solver
+        # The solvers start from the board after the opening auto moves
+        board = Board.from_screen(self)
+        board.play_auto_moves()
+        if find_deadlock(board) is not None:
+            self.is_lose = True  # Lost from the deal, no need to search
+            return None
+        if config_manager.gameAiCacheSize <= 0:
+            return BackgroundSolver(solver, self, **kwargs)
+
+        fingerprint = board.fingerprint()
+        mode = f"{self.ai_player}:{solver.__name__}"
+        try:
+            cache = SolutionCache(config_manager.gameAiCacheFile, config_manager.gameAiCacheSize)
+            moves = cache.get(fingerprint, mode)
+        except sqlite3.Error as e:
+            print(f"Solution cache unavailable: {e}")
+            return BackgroundSolver(solver, self, **kwargs)
+
+        if moves is not None:
+            return BackgroundSolver(CachedSolver, self, moves=moves)
+
+        def on_solved(ai):
+            try:
+                cache.put(fingerprint, mode, board.to_canonical(ai.solution_path))
+            except sqlite3.Error as e:
+                print(f"Solution not cached: {e}")  # The moves are still played
+
+        return BackgroundSolver(solver, self, **kwargs, on_solved=on_solved)
+
+    def stop_ai(self):
+        """
+        Cancels the AI search if it is still running, called when leaving the screen
+        """
+        if self.ai is not None:
+            self.ai.cancel()
 
     def _reload_config(self):
         self.anim_duration = self._get_anim_speed(config_manager.gameFastMode,config_manager.gameNoAnims)
@@ -208,6 +307,7 @@ class GameplayScreen:
             if event.type == pygame.MOUSEBUTTONDOWN:
                 ret = self.sidebar.handle_event(event)
                 if ret == "back_to_menu":
+                    self.stop_ai()
                     return "back_to_menu"
                 elif ret == "options":
                     self.isOptions = True
@@ -236,8 +336,10 @@ class GameplayScreen:
         if self.is_won or self.is_lose:
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
+                    self.stop_ai()
                     return "restart_game"  # Reiniciar o jogo
                 elif event.key == pygame.K_m:
+                    self.stop_ai()
                     return "back_to_menu"  # Voltar ao menu principal
             return None
 
@@ -502,37 +604,28 @@ class GameplayScreen:
         Analisa o estado atual do jogo e retorna a carta e o slot de destino para a dica.
         Prioriza movimentos entre slots para cores diferentes, depois para o mesmo naipe,
         e por último verifica se a carta pode ir para a fundação.
+        The moves come from the headless Board (Board.legal_moves), so the stacks the rules allow count too.
         :return: (card, slot) ou None se não houver movimentos válidos.
         """
+        board = Board.from_screen(self)
+        cards = Board.card_lookup(self)
+        moves = board.legal_moves()
+        slot_moves = [(code, target) for _, code, target in moves if target < NUM_SLOTS]
+
         # 1. Priorizar movimentos entre slots para cores diferentes
-        for source_slot in self.slots:
-            card = source_slot.top_card()
-            if card:
-                for target_slot in self.slots:
-                    if target_slot != source_slot and target_slot.can_accept_card(card):
-                        # Verificar se as cores são diferentes
-                        if card.suit in ['Hearts', 'Diamonds'] and target_slot.top_card().suit in ['Spades', 'Clubs']:
-                            return card, target_slot
-                        if card.suit in ['Spades', 'Clubs'] and target_slot.top_card().suit in ['Hearts', 'Diamonds']:
-                            return card, target_slot
+        for code, target in slot_moves:
+            if is_red(code) != is_red(board.slots[target][-1]):
+                return cards[code], self.slots[target]
 
         # 2. Movimentos entre slots para o mesmo naipe
-        for source_slot in self.slots:
-            card = source_slot.top_card()
-            if card:
-                for target_slot in self.slots:
-                    if target_slot != source_slot and target_slot.can_accept_card(card):
-                        # Verificar se os naipes são iguais
-                        if card.suit == target_slot.top_card().suit:
-                            return card, target_slot
+        for code, target in slot_moves:
+            if card_suit(code) == card_suit(board.slots[target][-1]):
+                return cards[code], self.slots[target]
 
         # 3. Movimentos para as fundações
-        for slot in self.slots:
-            card = slot.top_card()
-            if card:
-                for foundation in self.foundations:
-                    if foundation.can_accept_card(card):
-                        return card, foundation
+        for _, code, target in moves:
+            if target >= NUM_SLOTS:
+                return cards[code], self.foundations[target - NUM_SLOTS]
 
         # Nenhum movimento válido encontrado
         return None
@@ -115,10 +115,11 @@ class MenuScreen(Screen):
                 self._handle_return_event(event)
             if self.state == "difficulty_selection":
                 self.difficulty_selector.handle_event(event)
+            columns = self._get_columns(len(button_list))
             if event.key == pygame.K_DOWN:
-                self.selected_button = (self.selected_button + 2) % len(button_list)
+                self.selected_button = (self.selected_button + columns) % len(button_list)
             elif event.key == pygame.K_UP:
-                self.selected_button = (self.selected_button - 2) % len(button_list)
+                self.selected_button = (self.selected_button - columns) % len(button_list)
             elif event.key == pygame.K_LEFT:
                 self.selected_button = (self.selected_button - 1) % len(button_list)
             elif event.key == pygame.K_RIGHT:
@@ -243,7 +244,7 @@ class MenuScreen(Screen):
         """Creates new buttons for game mode selection."""
         self.new_buttons = []
         self.button_move_anims = []
-        labels = ["Human", "Breath FS", "Depth FS", "Uniformed CS", "Placeholder", "Back"]
+        labels = ["Human", "Breath FS", "Depth FS", "Uniformed CS", "A* Search", "IDA* Search", "Weighted A*", "Anytime", "Beam Search", "MCTS", "Back"]
 
         for i, label in enumerate(labels):
             x_pos, y_pos = self._get_button_start(i, len(labels))
@@ -260,25 +261,41 @@ class MenuScreen(Screen):
             self.new_buttons.append(button)
         self._animate_buttons_in(self.new_buttons)
 
+    def _get_columns(self, totalnum):
+        """
+        Number of button columns, a third one is added when 2 would go below the screen.
+        """
+        if totalnum < 4:
+            return 1
+        elif totalnum <= 6:
+            return 2
+        return 3
+
     def _get_button_start(self, button_num, totalnum):
         """
         Calculate the starting position (x, y) for a button.
         """
         screen_width = 480
         middle = screen_width // 2
+        columns = self._get_columns(totalnum)
 
-        if totalnum < 4:
+        if columns == 1:
             # Single column layout: center the button
             x_pos = middle
             row = button_num
-        else:
+        elif columns == 2:
             row = button_num // 2
             if button_num % 2 == 0:
                 x_pos = middle - 70
             else:
                 x_pos = middle + 70
+        else:
+            row = button_num // 3
+            x_pos = middle + (button_num % 3 - 1) * 140
 
-        y_pos = self.start_y + row * self.spacing
+        # Past 3 rows the buttons start higher so the last row stays on screen
+        rows = -(-totalnum // columns)
+        y_pos = self.start_y - max(rows - 3, 0) * self.spacing + row * self.spacing
         return x_pos, y_pos
 
     def render(self, screen):
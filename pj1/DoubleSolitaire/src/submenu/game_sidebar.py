@@ -18,6 +18,7 @@ class Sidebar:
         self.time_left = "00:00"
         self.score = "0"
         self.moves_left = "0"
+        self.ai_status = ""  # Progress of a running AI search
 
         self.buttons = []
         self.button_img_path = "assets/options/Button.png"
@@ -47,6 +48,9 @@ class Sidebar:
     def set_score(self, score):
         self.score = score
 
+    def set_ai_status(self, status):
+        self.ai_status = status
+
     def handle_event(self, event):
         """
         Handle events for the sidebar.
@@ -113,5 +117,10 @@ class Sidebar:
         surface.blit(score_text, score_text_rect)
         surface.blit(score_value, score_value_rect)
 
+        if self.ai_status:
+            status_text = self.font.render(self.ai_status, False, (255, 215, 0))
+            status_rect = status_text.get_rect(centerx=self.rect.centerx, top=score_value_rect.bottom + 10)
+            surface.blit(status_text, status_rect)
+
         for btn in self.buttons:
             btn.draw(surface)